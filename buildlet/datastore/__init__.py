@@ -6,3 +6,4 @@ from .inmemory import *
 from .directory import *
 from .autodirectory import *
 from .autoserialize import *
+from .compressed import *
@@ -4,7 +4,9 @@ Data store on file system with automatically generated directory/file name.
 
 import os
 
+from ..utils import mkdirp, lockedfile
 from ..kvstore.picklestore import KVStorePickle
+from ..kvstore.filestore import KVStoreFiles
 from .directory import _DataDirectory, DataDirectory
 from .base import MixInDataStoreNestableAutoValue
 
@@ -39,44 +41,130 @@ class DataAutoDirectory(_DataDirectory):
     """
 
     KeyPathMapClass = KVStorePickle
+    keypathmap_journal = True
+    """
+    Passed as `journal` argument to :attr:`KeyPathMapClass`.
+    See :class:`buildlet.kvstore.base.BaseKVStore`.
+    """
+
     default_metastore_type = DataDirectory
     pathwidth = 3
 
+    pathnaming = 'counter'
+    """
+    How to name the path for a new key.
+
+    ``'counter'``
+       Sequential hexadecimal numbers (see :meth:`newpath`).
+
+    ``'digest'``
+       Digest of the key (see :meth:`digestpath`).  Path of a key is
+       known without looking up :attr:`keypathmap`, which is only
+       used for iteration and reverse lookup.  Use with
+       :class:`buildlet.kvstore.filestore.KVStoreFiles` as
+       :attr:`KeyPathMapClass` to avoid any shared file.
+       See :class:`DataDigestDirectory`.
+
+    """
+
+    digestwidth = 32
+    """
+    Number of hexadecimal digits used by :meth:`digestpath`.
+    """
+
     def __init__(self, *args, **kwds):
         super(DataAutoDirectory, self).__init__(*args, **kwds)
         self.get_metastore()
-        self.keypathmap = self.KeyPathMapClass(self.get_keypathmappath())
+        self.keypathmap = self.KeyPathMapClass(
+            self.get_keypathmappath(), journal=self.keypathmap_journal)
 
     def get_keypathmappath(self):
         return os.path.join(self.get_metastorepath(), 'keypathmap')
 
+    def get_pathcounterpath(self):
+        return os.path.join(self.get_metastorepath(), 'pathcounter')
+
     def newpath(self):
-        values = self.keypathmap.values()
-        if values:
-            next = max((int(v, 16) for v in values)) + 1
-        else:
-            next = 0
+        """
+        Allocate a new path (relative to :attr:`path`).
+
+        Paths are allocated from a counter stored in the metastore.
+        The counter file is locked while it is updated, so that
+        processes sharing this directory never get the same path.
+
+        """
+        counterpath = self.get_pathcounterpath()
+        mkdirp(os.path.dirname(counterpath))
+        with lockedfile(counterpath) as f:
+            data = f.read()
+            if data:
+                next = int(data)
+            else:
+                # Directory made before the counter was introduced
+                values = self.keypathmap.values()
+                next = max([int(v, 16) + 1 for v in values] or [0])
+            f.seek(0)
+            f.truncate()
+            f.write(str(next + 1))
         path = '{0:0{1}x}'.format(next, self.pathwidth)
         assert path != self.metakey
         return path
 
+    def digestpath(self, key):
+        """
+        Return a path (relative to :attr:`path`) derived from `key`.
+        """
+        return self.keypathmap.digest_key(key)[:self.digestwidth]
+
     def getpath(self, key):
+        """
+        Return the path (relative to :attr:`path`) for `key`.
+
+        A new path is allocated and recorded in :attr:`keypathmap`
+        if `key` is new.  It is done in one :meth:`autosync
+        <buildlet.kvstore.base.BaseKVStore.autosync>` block, using
+        `setdefault` of :attr:`keypathmap`, so that processes racing
+        for the same key get the same path.
+
+        """
         db = self.keypathmap
-        if key in db:
-            path = db[key]
-        else:
-            db[key] = path = self.newpath()
-        return path
+        with db.autosync():
+            if self.pathnaming == 'digest':
+                return db.setdefault(key, self.digestpath(key))
+            elif key in db:
+                return db[key]
+            else:
+                return db.setdefault(key, self.newpath())
 
     def aspath(self, key):
-        subpath = self.getpath(key)
+        subpath = self.shardpath(self.getpath(key))
         return os.path.join(self.path, subpath)
 
+    def find_path(self, key):
+        # Do not allocate new path (see `getpath`) for lookup.
+        with self.keypathmap.autosync():
+            if key not in self.keypathmap:
+                return None
+            subpath = self.keypathmap[key]
+        path = os.path.join(self.path, self.shardpath(subpath))
+        if os.path.exists(path):
+            return path
+
+    def clear(self):
+        super(DataAutoDirectory, self).clear()
+        self.keypathmap.clear()
+
+    def _batch(self):
+        # Sync :attr:`keypathmap` only once for the operations.
+        return self.keypathmap.autosync()
+
     def __len__(self):
-        return len(self.keypathmap)
+        with self.keypathmap.autosync():
+            return len(self.keypathmap)
 
     def __iter__(self):
-        return iter(self.keypathmap)
+        with self.keypathmap.autosync():
+            return iter(list(self.keypathmap))
 
     def __delitem__(self, key):
         with self.keypathmap.autosync():
@@ -98,3 +186,32 @@ class DataAutoDirectoryWithMagic(MixInDataStoreNestableAutoValue,
     """
     Directory based nestable data store with auto-serializer.
     """
+
+
+class DataDigestDirectory(DataAutoDirectory):
+
+    """
+    :class:`DataAutoDirectory` naming paths by digest of keys.
+
+    Substores can be created by many processes at the same time
+    without any coordination, as there is no shared file.
+
+    >>> from buildlet.utils.tempdir import TemporaryDirectory
+    >>> with TemporaryDirectory() as tempdir:
+    ...     ds = DataDigestDirectory(tempdir)
+    ...     ds_nested = ds.get_substore(('very', 'complex', 'key'))
+    ...     print(ds_nested.path == os.path.join(
+    ...         tempdir, ds.digestpath(('very', 'complex', 'key'))))
+    True
+
+    """
+
+    KeyPathMapClass = KVStoreFiles
+    pathnaming = 'digest'
+
+
+class DataDigestDirectoryWithMagic(MixInDataStoreNestableAutoValue,
+                                   DataDigestDirectory):
+    """
+    Digest-named directory data store with auto-serializer.
+    """
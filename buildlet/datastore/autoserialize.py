@@ -1,9 +1,12 @@
 """
-Value store with automatic serialization (Pickle/JSON/YAML).
+Value store with automatic serialization (Pickle/JSON/YAML/NumPy).
 """
 
 import os
+import mmap
+import struct
 
+from ..utils import _pickle
 from .base import MixInDataStoreFileSystem, BaseDataValue
 
 
@@ -12,11 +15,20 @@ class BaseDataValueAutoSerialize(MixInDataStoreFileSystem, BaseDataValue):
     mode = 't'
 
     def set(self, value):
-        with open(self.path, 'w' + self.mode) as fp:
-            self.dump(value, fp)
+        # Write to a new file and then replace the old one, so that
+        # values loaded from the old file (memory-mapped by some
+        # subclasses) remain valid.
+        temppath = self._temppath()
+        try:
+            with self._openpath(temppath, 'w' + self.mode) as fp:
+                self.dump(value, fp)
+            os.rename(temppath, self.path)
+        finally:
+            if os.path.exists(temppath):
+                os.remove(temppath)
 
     def get(self):
-        with open(self.path, 'r' + self.mode) as fp:
+        with self._open('r' + self.mode) as fp:
             return self.load(fp)
 
     def clear(self):
@@ -42,17 +54,117 @@ class DataValuePickle(BaseDataValueAutoSerialize):
     ...     ds.get()
     {'some': 'data'}
 
+    Values are pickled with :attr:`protocol`.  With protocol 5 or
+    higher (Python >= 3.8), large buffers such as the data of NumPy
+    arrays and bytearrays are stored "out-of-band" after the pickle
+    stream, in the same file (see :attr:`outofband`).  When loading,
+    the file is memory-mapped (copy-on-write) and the buffers are
+    passed to the unpickler without copying them through the pickle
+    stream.  Pages are read from the disk only when accessed and
+    shared with the other processes loading the same value.
+
     """
 
     mode = 'b'
 
+    protocol = _pickle.HIGHEST_PROTOCOL
+    """
+    Pickle protocol.
+    """
+
+    outofband = True
+    """
+    Store buffers out-of-band when :attr:`protocol` supports it.
+    """
+
     def dump(self, obj, fp):
-        from ..utils import _pickle
-        _pickle.dump(obj, fp)
+        if self.outofband and self.protocol >= 5:
+            dump_outofband(obj, fp, self.protocol)
+        else:
+            _pickle.dump(obj, fp, self.protocol)
 
     def load(self, fp):
-        from ..utils import _pickle
+        return load_outofband(fp)
+
+    def get(self):
+        if not self._mmappable:
+            return super(DataValuePickle, self).get()
+        with self._open('rb') as fp:
+            mm = None
+            if fp.read(len(OUTOFBAND_MAGIC)) == OUTOFBAND_MAGIC:
+                mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_COPY)
+            fp.seek(0)
+            return load_outofband(fp, mm)
+
+
+OUTOFBAND_MAGIC = b'\x00BUILDLET-PICKLE-OOB\x00'
+OUTOFBAND_ALIGNMENT = 64
+
+
+def dump_outofband(obj, fp, protocol=5):
+    """
+    Pickle `obj` into file `fp`, storing buffers out-of-band.
+
+    If no out-of-band buffer is made, plain pickle is written.
+    Otherwise, file consists of :data:`OUTOFBAND_MAGIC`, a header
+    (length of the pickle, number of buffers and offset and length of
+    each buffer as little endian 64-bit integers), the pickle, and
+    the buffers, each aligned to :data:`OUTOFBAND_ALIGNMENT` bytes.
+
+    """
+    buffers = []
+    data = _pickle.dumps(obj, protocol, buffer_callback=buffers.append)
+    if not buffers:
+        fp.write(data)
+        return
+    views = [b.raw() for b in buffers]
+    headerlen = len(OUTOFBAND_MAGIC) + struct.calcsize('<QQ') * (
+        1 + len(views))
+    layout = []
+    end = headerlen + len(data)
+    for view in views:
+        start = -(-end // OUTOFBAND_ALIGNMENT) * OUTOFBAND_ALIGNMENT
+        layout.append((start, view.nbytes))
+        end = start + view.nbytes
+    fp.write(OUTOFBAND_MAGIC)
+    fp.write(struct.pack('<QQ', len(data), len(views)))
+    for pair in layout:
+        fp.write(struct.pack('<QQ', *pair))
+    fp.write(data)
+    end = headerlen + len(data)
+    for (view, (start, length)) in zip(views, layout):
+        fp.write(b'\x00' * (start - end))
+        fp.write(view)
+        end = start + length
+
+
+def load_outofband(fp, mm=None):
+    """
+    Load an object pickled by :func:`dump_outofband` from file `fp`.
+
+    If `mm` (memory map of the file) is given, the buffers are views
+    of it.  Otherwise, they are read from `fp`.  Plain pickle is
+    loaded as usual.
+
+    """
+    if fp.read(len(OUTOFBAND_MAGIC)) != OUTOFBAND_MAGIC:
+        fp.seek(0)
         return _pickle.load(fp)
+    size = struct.calcsize('<QQ')
+    (datalen, num) = struct.unpack('<QQ', fp.read(size))
+    layout = [struct.unpack('<QQ', fp.read(size)) for _ in range(num)]
+    data = fp.read(datalen)
+    end = len(OUTOFBAND_MAGIC) + size * (1 + num) + datalen
+    buffers = []
+    if mm is not None:
+        view = memoryview(mm)
+        buffers = [view[start:start + length] for (start, length) in layout]
+    else:
+        for (start, length) in layout:
+            fp.read(start - end)
+            buffers.append(bytearray(fp.read(length)))
+            end = start + length
+    return _pickle.loads(data, buffers=buffers)
 
 
 class DataValueJSON(BaseDataValueAutoSerialize):
@@ -90,12 +202,188 @@ class DataValueYAML(BaseDataValueAutoSerialize):
     ...     ds.get()
     {'some': 'data'}
 
+    The C implementation of the loader and the dumper (LibYAML) is
+    used when available.
+
     """
 
     def dump(self, obj, fp):
         import yaml
-        yaml.dump(obj, fp)
+        yaml.dump(obj, fp, Dumper=getattr(yaml, 'CDumper', yaml.Dumper))
 
     def load(self, fp):
         import yaml
-        return yaml.load(fp)
+        return yaml.load(fp, Loader=getattr(yaml, 'CLoader', yaml.Loader))
+
+
+class DataValueBytes(BaseDataValueAutoSerialize):
+
+    """
+    Value store for a byte string, stored as-is.
+
+    >>> from buildlet.utils.tempdir import TemporaryDirectory
+    >>> with TemporaryDirectory() as tempdir:
+    ...     ds = DataValueBytes(os.path.join(tempdir, 'tmp'))
+    ...     ds.set(b'some data')
+    ...     print(ds.get().decode())
+    some data
+
+    """
+
+    mode = 'b'
+
+    def dump(self, obj, fp):
+        fp.write(obj)
+
+    def load(self, fp):
+        return fp.read()
+
+
+class DataValueNumpy(BaseDataValueAutoSerialize):
+
+    """
+    NumPy-based value store for arrays.
+
+    >>> import numpy
+    >>> from buildlet.utils.tempdir import TemporaryDirectory
+    >>> with TemporaryDirectory() as tempdir:
+    ...     ds = DataValueNumpy(os.path.join(tempdir, 'tmp'))
+    ...     ds.set(numpy.arange(3))
+    ...     print(ds.get()[1:])
+    ...     ds.set({'a': numpy.arange(3), 'b': numpy.ones(2)})
+    ...     print(sorted(ds.get()))
+    [1 2]
+    ['a', 'b']
+
+    An array (or anything :func:`numpy.save` accepts) is stored in
+    the ``.npy`` format and a dict of arrays in the (uncompressed)
+    ``.npz`` format.  A dict of arrays is loaded as a dict.
+
+    Arrays are loaded as read-only :class:`numpy.memmap` (see
+    :attr:`mmap_mode`), including the arrays in a dict.  Therefore,
+    loading is instant even for huge arrays and only the accessed
+    part is read from the disk.  Processes loading the same array
+    share its pages in the page cache.  Arrays which can't be mapped
+    (e.g., empty arrays or arrays of Python objects) are read into
+    memory.
+
+    To store values in a directory as arrays, use this class as
+    the value store type of the directory::
+
+        class ArrayDirectory(DataDirectoryWithMagic):
+            default_valuestore_type = DataValueNumpy
+
+    """
+
+    mode = 'b'
+
+    mmap_mode = 'r'
+    """
+    `mode` for :class:`numpy.memmap`.  None means to read arrays
+    into memory.
+    """
+
+    def dump(self, obj, fp):
+        import numpy
+        if isinstance(obj, dict):
+            self._savez(fp, obj)
+        else:
+            numpy.save(fp, obj)
+
+    @staticmethod
+    def _savez(fp, arrays):
+        # Same as `numpy.savez(fp, **arrays)` but any key can be used
+        # (e.g., 'file') and the output does not depend on time.
+        import io
+        import zipfile
+        import numpy
+        from numpy.lib import format as npformat
+        zf = zipfile.ZipFile(fp, 'w', zipfile.ZIP_STORED, allowZip64=True)
+        try:
+            for (key, value) in arrays.items():
+                buf = io.BytesIO()
+                npformat.write_array(buf, numpy.asanyarray(value),
+                                     allow_pickle=True)
+                info = zipfile.ZipInfo(key + '.npy',
+                                       date_time=(1980, 1, 1, 0, 0, 0))
+                zf.writestr(info, buf.getvalue())
+        finally:
+            zf.close()
+
+    def get(self):
+        import zipfile
+        from numpy.lib import format as npformat
+        with open(self.path, 'rb') as fp:
+            if not zipfile.is_zipfile(fp):
+                fp.seek(0)
+                return self._read_array(fp)
+            fp.seek(0)
+            arrays = {}
+            zf = zipfile.ZipFile(fp)
+            try:
+                for info in zf.infolist():
+                    name = info.filename
+                    if name.endswith('.npy'):
+                        name = name[:-len('.npy')]
+                    if info.compress_type == zipfile.ZIP_STORED:
+                        fp.seek(self._zip_data_offset(fp, info))
+                        arrays[name] = self._read_array(fp)
+                    else:
+                        arrays[name] = npformat.read_array(
+                            zf.open(info), allow_pickle=True)
+            finally:
+                zf.close()
+            return arrays
+
+    @staticmethod
+    def _zip_data_offset(fp, info):
+        # Data of a member starts after its "local file header" which
+        # is 30 bytes followed by the file name and the extra field.
+        fp.seek(info.header_offset)
+        header = fp.read(30)
+        (namelen, extralen) = struct.unpack('<HH', header[26:30])
+        return info.header_offset + 30 + namelen + extralen
+
+    def _read_array(self, fp):
+        """
+        Read an array in ``.npy`` format at the position of file `fp`.
+
+        `fp` must be a file object of :attr:`path`.
+
+        """
+        import numpy
+        from numpy.lib import format as npformat
+        start = fp.tell()
+        version = npformat.read_magic(fp)
+        read_header = {
+            (1, 0): npformat.read_array_header_1_0,
+            (2, 0): npformat.read_array_header_2_0,
+        }.get(version)
+        if self.mmap_mode and read_header:
+            (shape, fortran_order, dtype) = read_header(fp)
+            if not dtype.hasobject and numpy.prod(shape) > 0:
+                return numpy.memmap(
+                    self.path, dtype=dtype, shape=shape, mode=self.mmap_mode,
+                    order='F' if fortran_order else 'C', offset=fp.tell())
+        fp.seek(start)
+        return npformat.read_array(fp, allow_pickle=True)
+
+
+VALUESTORE_TYPES = {
+    bytes: DataValueBytes,
+    'numpy:ndarray': DataValueNumpy,
+}
+"""
+Map from type to value store class for
+:attr:`.base.MixInDataStoreNestableAutoValue.valuestore_types`.
+
+Byte strings are stored as-is and NumPy arrays by
+:class:`DataValueNumpy` (which are loaded as read-only memory maps).
+Other values are pickled (:attr:`default_valuestore_type
+<.base.BaseDataStoreNestable.default_valuestore_type>` of the
+directories).  To use it::
+
+    class MyDirectory(DataDirectoryWithMagic):
+        valuestore_types = VALUESTORE_TYPES
+
+"""
@@ -4,12 +4,15 @@ Base data store classes.
 
 import os
 import shutil
+import binascii
 import collections
 import itertools
+from contextlib import contextmanager
 
 from ..utils.hashutils import hexdigest
 
 METAKEY = '.buildlet'
+TEMPPREFIX = '.buildlet-tmp-'
 
 
 class BaseDataStore(object):
@@ -57,6 +60,39 @@ class BaseDataStore(object):
         """
         return None
 
+    def stamp(self):
+        """
+        Return a cheap object which changes when the data changes.
+
+        This is used to cache the value of :meth:`hash` (see
+        :meth:`hash_with_stamp`).  Returning `None` (default) means
+        that no stamp is available and the hash is not cached.
+
+        For file-based datastore, this is a tuple of inode number,
+        size and modification time of the file.
+
+        """
+        return None
+
+    _stampedhash = None
+
+    def hash_with_stamp(self):
+        """
+        Return a pair of :meth:`stamp` and :meth:`hash`.
+
+        :meth:`hash` is called only when the stamp is changed since
+        the last call.
+
+        """
+        stamp = self.stamp()
+        if stamp is not None and self._stampedhash is not None and \
+           self._stampedhash[0] == stamp:
+            return self._stampedhash
+        pair = (stamp, self.hash())
+        if stamp is not None:
+            self._stampedhash = pair
+        return pair
+
 
 class BaseDataValue(BaseDataStore):
 
@@ -235,17 +271,114 @@ class BaseDataStoreNestable(collections.MutableMapping, BaseDataStore):
         if self._metastore:
             self._metastore.clear()
 
+    @contextmanager
+    def _batch(self):
+        """
+        Context manager to run many operations as a batch.
+
+        Child class can override this to do bookkeeping (e.g.,
+        syncing metadata) once for the operations in the block.
+
+        """
+        yield
+
+    def get_many(self, keys, concurrency=None):
+        """
+        Return a list of ``self[key]`` for each key in `keys`.
+
+        Data stores may load values using `concurrency` threads.
+        Default implementation ignores it.
+
+        """
+        with self._batch():
+            return [self[key] for key in keys]
+
+    def set_many(self, mapping, concurrency=None):
+        """
+        Do ``self[key] = value`` for each item of `mapping`.
+
+        `mapping` is a dict or an iterable of pairs of key and value.
+        Data stores may save values using `concurrency` threads.
+        Default implementation ignores it.
+
+        """
+        with self._batch():
+            for (key, value) in _iteritems(mapping):
+                self[key] = value
+
+    def delete_many(self, keys):
+        """
+        Do ``del self[key]`` for each key in `keys`.
+        """
+        with self._batch():
+            for key in keys:
+                del self[key]
+
     def hash(self):
-        strings = []
-        for key in itertools.chain(sorted(self)):
-            store = self._get_store(key)
-            subhash = store.hash()
-            if subhash is None:
-                return None
-            strings.append(key)
-            strings.append(str(subhash))
-        strings.append(self.__class__.__name__)
-        return hexdigest(strings)
+        return self.hash_with_stamp()[1]
+
+    def stamp(self):
+        return self.hash_with_stamp()[0]
+
+    def liststamp(self):
+        """
+        Return a stamp which changes when a sub-data store is added or
+        removed outside of this instance.
+
+        It is a part of :meth:`stamp`.  Default is None, meaning that
+        every change goes through this instance.
+
+        """
+        return None
+
+    def hash_with_stamp(self):
+        """
+        Return a pair of stamp and hash, computed as a Merkle tree.
+
+        The stamp of this store is a digest of :meth:`liststamp` and
+        the stamps of its sub-data stores and the hash is a digest of
+        their hashes.  Each sub-data store caches its hash with its
+        stamp, and so does this store.  Therefore, after the first
+        call, only the stamps are checked and only the modified
+        branches are hashed again.
+
+        """
+        # Take it before listing, so that a change while listing is
+        # noticed next time.
+        liststamp = self.liststamp()
+        entries = []
+        for key in sorted(self):
+            (substamp, subhash) = self._get_store(key).hash_with_stamp()
+            entries.append((key, substamp, subhash))
+
+        if any(substamp is None for (_, substamp, _) in entries):
+            stamp = None
+        else:
+            strings = []
+            for (key, substamp, _) in entries:
+                strings.append(key)
+                strings.append(repr(substamp))
+            strings.append(repr(liststamp))
+            strings.append(self.__class__.__name__)
+            stamp = hexdigest(strings)
+            if self._stampedhash is not None and \
+               self._stampedhash[0] == stamp:
+                return self._stampedhash
+
+        if any(subhash is None for (_, _, subhash) in entries):
+            digest = None
+        else:
+            strings = []
+            for (key, _, subhash) in entries:
+                strings.append(key)
+                strings.append(str(subhash))
+            strings.append(self.__class__.__name__)
+            digest = hexdigest(strings)
+
+        pair = (stamp, digest)
+        if stamp is not None:
+            self._stampedhash = pair
+        return pair
 
 
 class MixInDataStoreNestableMetaInKey(BaseDataStoreNestable):
@@ -309,10 +442,41 @@ class MixInDataStoreNestableAutoValue(BaseDataStoreNestable):
       value = ds[key]
 
     Here, `value` must be serialise-able by the data store
-    specified by :attr:`default_valuestore_type`.
+    specified by :attr:`default_valuestore_type`, or by the data store
+    chosen for the type of `value` by :attr:`valuestore_types`.
+
+    """
+
+    valuestore_types = {}
+    """
+    Map from type of value to value store class.
+
+    Keys are classes or strings ``'module:name'`` which can be used
+    without importing the module (e.g., ``'numpy:ndarray'``).  Value
+    store class for a value is looked up along the MRO of its type,
+    falling back to :attr:`default_valuestore_type`.  See
+    :data:`buildlet.datastore.autoserialize.VALUESTORE_TYPES` for
+    a ready-made map.
+
+    When a value of another type is set to a key, the value store
+    of the key is replaced.  Value store obtained for the key before
+    that must not be used.
 
     """
 
+    def get_valuestore_type(self, value):
+        """
+        Return value store class to store `value`.
+        """
+        types = self.valuestore_types
+        if types:
+            for cls in type(value).__mro__:
+                tag = '{0}:{1}'.format(cls.__module__, cls.__name__)
+                for k in (cls, tag):
+                    if k in types:
+                        return types[k]
+        return self.default_valuestore_type
+
     def _get_store(self, key):
         return super(MixInDataStoreNestableAutoValue, self).__getitem__(key)
 
@@ -320,20 +484,89 @@ class MixInDataStoreNestableAutoValue(BaseDataStoreNestable):
         super(MixInDataStoreNestableAutoValue, self).__setitem__(key, value)
 
     def __getitem__(self, key):
-        value = self._get_store(key)
-        if isinstance(value, BaseDataValue):
-            if not value.exists():
+        return self._load(key, self._get_store(key))
+
+    @staticmethod
+    def _load(key, store):
+        if isinstance(store, BaseDataValue):
+            if not store.exists():
                 raise KeyError('Value for {0!r} is not yet set.'.format(key))
-            return value.get()
+            return store.get()
         else:
-            return value
+            return store
 
     def __setitem__(self, key, value):
+        store = self._prepare_store(key, value)
+        if store is not None:
+            store.set(value)
+
+    def _prepare_store(self, key, value):
+        """
+        Return value store to save `value` or None if it is a store.
+        """
         if isinstance(value, BaseDataStore):
             self._set_store(key, value)
+            return None
+        dstype = self.get_valuestore_type(value)
+        try:
+            store = self._get_store(key)
+        except KeyError:
+            pass
         else:
-            store = self.get_valuestore(key)
-            store.set(value)
+            if isinstance(store, BaseDataValue) and \
+               not isinstance(store, dstype):
+                # Value of another type was stored.
+                del self[key]
+        return self.get_valuestore(key, dstype)
+
+    def get_many(self, keys, concurrency=None):
+        """
+        Return a list of ``self[key]`` for each key in `keys`.
+
+        Data stores are looked up in one batch and then values are
+        loaded using `concurrency` threads (if given).
+
+        """
+        keys = list(keys)
+        with self._batch():
+            stores = [self._get_store(key) for key in keys]
+        return _map(lambda args: self._load(*args), list(zip(keys, stores)),
+                    concurrency)
+
+    def set_many(self, mapping, concurrency=None):
+        """
+        Do ``self[key] = value`` for each item of `mapping`.
+
+        Value stores are prepared in one batch and then values are
+        saved using `concurrency` threads (if given).
+
+        """
+        with self._batch():
+            jobs = [(self._prepare_store(key, value), value)
+                    for (key, value) in _iteritems(mapping)]
+        _map(lambda job: job[0].set(job[1]),
+             [job for job in jobs if job[0] is not None], concurrency)
+
+
+def _iteritems(mapping):
+    if hasattr(mapping, 'items'):
+        return mapping.items()
+    return mapping
+
+
+def _map(func, args, concurrency=None):
+    """
+    Return ``list(map(func, args))``, using threads if `concurrency`.
+    """
+    if not concurrency or concurrency <= 1 or len(args) <= 1:
+        return [func(a) for a in args]
+    from multiprocessing.pool import ThreadPool
+    pool = ThreadPool(min(concurrency, len(args)))
+    try:
+        return pool.map(func, args)
+    finally:
+        pool.close()
+        pool.join()
 
 
 class MixInDataStoreFileSystem(BaseDataStore):
@@ -349,9 +582,40 @@ class MixInDataStoreFileSystem(BaseDataStore):
     def exists(self):
         return os.path.exists(self.path)
 
+    def stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_size,
+                getattr(st, 'st_mtime_ns', st.st_mtime))
+
     def aspath(self, key):
         raise NotImplementedError
 
+    _mmappable = True
+    # Whether the file opened by `_open` can be memory-mapped.
+
+    def _open(self, *args, **kwds):
+        """
+        Open the file at :attr:`path`.  Arguments are as of `open`.
+        """
+        return self._openpath(self.path, *args, **kwds)
+
+    def _openpath(self, path, *args, **kwds):
+        """
+        Open the file at `path` as :meth:`_open` does for :attr:`path`.
+        """
+        return open(path, *args, **kwds)
+
+    def _temppath(self):
+        """
+        Return a new path for a temporary file next to :attr:`path`.
+        """
+        (dirname, basename) = os.path.split(self.path)
+        return os.path.join(dirname, '{0}{1}-{2}'.format(
+            TEMPPREFIX, basename, binascii.hexlify(os.urandom(8)).decode()))
+
 
 class BaseDataDirectory(MixInDataStoreFileSystem, BaseDataStoreNestable):
 
@@ -359,6 +623,9 @@ class BaseDataDirectory(MixInDataStoreFileSystem, BaseDataStoreNestable):
     Base class for file-based nestable datastore.
     """
 
+    # Stamp of a directory is computed from its contents.
+    stamp = BaseDataStoreNestable.stamp
+
     def get_substore(self, key, dstype=None, dskwds={}, **kwds):
         if 'path' not in dskwds:
             dskwds = dskwds.copy()
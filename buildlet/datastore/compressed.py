@@ -0,0 +1,196 @@
+"""
+Data stores compressing files transparently (gzip/bz2/lzma).
+"""
+
+import io
+import sys
+
+from .directory import DataFile
+from .autoserialize import DataValuePickle, DataValueJSON
+
+
+def _open_gzip(path, mode, level):
+    import gzip
+    fileobj = open(path, mode)
+    # Empty file name and zero mtime in the header make the output
+    # depend only on the content (see DataFile.hash).  `mtime` is not
+    # supported in Python 2.6.
+    kwds = dict(mtime=0) if sys.version_info >= (2, 7) else {}
+    gz = gzip.GzipFile(filename='', mode=mode, fileobj=fileobj,
+                       compresslevel=9 if level is None else level, **kwds)
+    # GzipFile closes `myfileobj` on close.
+    gz.myfileobj = fileobj
+    return gz
+
+
+def _open_bz2(path, mode, level):
+    import bz2
+    return bz2.BZ2File(path, mode, compresslevel=9 if level is None else level)
+
+
+def _open_lzma(path, mode, level):
+    import lzma
+    if 'w' in mode:
+        return lzma.LZMAFile(path, mode, preset=level)
+    return lzma.LZMAFile(path, mode)
+
+
+COMPRESSIONS = {
+    'gzip': _open_gzip,
+    'bz2': _open_bz2,
+    'lzma': _open_lzma,
+}
+"""
+Map from the name of compression algorithm to its opener.
+"""
+
+MAGICS = [
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\xfd7zXZ\x00', 'lzma'),
+]
+"""
+List of the magic bytes at the start of file and the compression.
+"""
+
+
+def detect_compression(path):
+    """
+    Return the compression of the file at `path` or None if unknown.
+    """
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(max(len(m) for (m, _) in MAGICS))
+    except (IOError, OSError):
+        return None
+    for (magic, compression) in MAGICS:
+        if head.startswith(magic):
+            return compression
+
+
+class MixInDataStoreCompressed(object):
+
+    """
+    Mix-in class to compress the file of a file-based data store.
+
+    Use it with a subclass of
+    :class:`.base.MixInDataStoreFileSystem`, like
+    :class:`DataFileCompressed`.
+
+    Algorithm and level can be set per class (by subclassing) or per
+    instance (by the keyword arguments of the constructor).  They are
+    used for writing.  For reading, the algorithm is detected from
+    the magic bytes of the file (see :func:`detect_compression`), so
+    that a store made with other settings, e.g., by a reopened
+    directory, can read the file.
+    The file is compressed and decompressed on the fly, so that
+    memory usage does not depend on the size of the data.
+
+    Only the standard library is used.  Note that ``'lzma'`` is
+    not available in Python 2.
+
+    """
+
+    compression = 'gzip'
+    """
+    Compression algorithm.  One of the keys of :data:`COMPRESSIONS`.
+    """
+
+    compresslevel = None
+    """
+    Compression level (`preset` for lzma).  None means the default
+    level of the algorithm.
+    """
+
+    _mmappable = False
+
+    def __init__(self, path, compression=None, compresslevel=None,
+                 *args, **kwds):
+        if compression is not None:
+            self.compression = compression
+        if compresslevel is not None:
+            self.compresslevel = compresslevel
+        if self.compression not in COMPRESSIONS:
+            raise ValueError('Unknown compression: {0!r}'
+                             .format(self.compression))
+        super(MixInDataStoreCompressed, self).__init__(path, *args, **kwds)
+
+    def _openpath(self, path, mode='r', buffering=None, encoding=None,
+                  errors=None, newline=None):
+        if '+' in mode:
+            raise ValueError('Compressed file can\'t be opened for both '
+                             'reading and writing.')
+        binmode = mode.replace('t', '').replace('b', '') + 'b'
+        compression = self.compression
+        if 'r' in mode:
+            compression = detect_compression(path) or compression
+        opener = COMPRESSIONS[compression]
+        fp = opener(path, binmode, self.compresslevel)
+        if not hasattr(fp, '__exit__'):
+            fp = _ClosingFile(fp)
+        if 'b' in mode or sys.version_info[0] < 3:
+            return fp
+        return io.TextIOWrapper(fp, encoding=encoding, errors=errors,
+                                newline=newline)
+
+
+class _ClosingFile(object):
+
+    """
+    Add context manager interface to file object `fp`.
+
+    GzipFile and BZ2File in Python 2.6 do not support ``with``.
+
+    """
+
+    def __init__(self, fp):
+        self._fp = fp
+
+    def __getattr__(self, name):
+        return getattr(self._fp, name)
+
+    def __iter__(self):
+        return iter(self._fp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self._fp.close()
+
+
+class DataFileCompressed(MixInDataStoreCompressed, DataFile):
+
+    """
+    Compressed version of :class:`.directory.DataFile`.
+
+    >>> from buildlet.utils.tempdir import TemporaryDirectory
+    >>> import os
+    >>> with TemporaryDirectory() as tempdir:
+    ...     ds = DataFileCompressed(os.path.join(tempdir, 'tmp'),
+    ...                             compression='bz2')
+    ...     with ds.open('wt') as f:
+    ...         _ = f.write('some data')
+    ...     with ds.open() as f:
+    ...         print(f.read())
+    some data
+
+    :meth:`hash` is computed from the compressed file.  It is the
+    same for the same data and the same compression setting.
+    Compressed file can't be memory-mapped.
+
+    """
+
+
+class DataValuePickleCompressed(MixInDataStoreCompressed, DataValuePickle):
+
+    """
+    Compressed version of :class:`.autoserialize.DataValuePickle`.
+    """
+
+
+class DataValueJSONCompressed(MixInDataStoreCompressed, DataValueJSON):
+
+    """
+    Compressed version of :class:`.autoserialize.DataValueJSON`.
+    """
@@ -3,14 +3,20 @@ File system directory oriented data store.
 """
 
 import os
+import sys
+import json
+import mmap
+import tempfile
 
 from .base import (
-    assert_datastore, METAKEY, BaseDataDirectory, BaseDataStream,
+    assert_datastore, METAKEY, TEMPPREFIX, BaseDataDirectory, BaseDataStream,
+    BaseDataValue, BaseDataStoreNestable,
     MixInDataStoreFileSystem, MixInDataStoreNestableMetaInKey,
     MixInDataStoreNestableAutoValue,
 )
 
 from ..utils import mkdirp
+from ..utils.hashutils import hexdigest, filedigest
 from .autoserialize import BaseDataValueAutoSerialize, DataValuePickle
 
 
@@ -28,17 +34,139 @@ class DataFile(MixInDataStoreFileSystem, BaseDataStream):
     ...         print(f.read())
     some data
 
+    :meth:`hash` is the digest of the content of the file, computed
+    by reading it in chunks of :attr:`hashchunksize` bytes.  The
+    digest is cached with the :meth:`stamp <.base.BaseDataStore.stamp>`
+    of the file, i.e., its inode number, size and modification time,
+    so that an unchanged file is not read again.  For a file in a
+    :class:`DataDirectory`, the cache is stored in a small file
+    (:meth:`get_hashcachepath`) and shared by other processes.
+    Otherwise, it is kept in memory.
+
+    """
+
+    stream = None
+
+    hashchunksize = 1 << 20
+    """
+    Size of the chunks to read to compute :meth:`hash`.
+    """
+
+    hashcachedir = None
+    """
+    Directory to store the cache of :meth:`hash`.  It is set by the
+    :class:`DataDirectory` containing this file.  If None, the cache
+    is kept in memory.
     """
 
+    _hashmemo = None
+
     def clear(self):
         self.stream = None
+        self._hashmemo = None
         if self.exists():
             os.remove(self.path)
+        cachepath = self.get_hashcachepath()
+        if cachepath and os.path.exists(cachepath):
+            os.remove(cachepath)
+
+    def get_hashcachepath(self):
+        """
+        Return the path to cache :meth:`hash` or None.
+
+        It is None unless :attr:`hashcachedir` is set.
+
+        """
+        if self.hashcachedir is None:
+            return None
+        return os.path.join(self.hashcachedir, os.path.basename(self.path))
+
+    def hash(self):
+        stamp = self.stamp()
+        if stamp is None:
+            return None
+        cachepath = self.get_hashcachepath()
+        if cachepath is None:
+            if self._hashmemo and self._hashmemo[0] == stamp:
+                return self._hashmemo[1]
+        else:
+            try:
+                with open(cachepath) as f:
+                    (cachedstamp, digest) = json.load(f)
+                if tuple(cachedstamp) == stamp:
+                    return str(digest)
+            except (IOError, OSError, ValueError):
+                pass
+        digest = filedigest(self.path, self.hashchunksize)
+        if self.stamp() == stamp:
+            # Cache only when the file is not modified while hashing.
+            if cachepath is None:
+                self._hashmemo = (stamp, digest)
+            else:
+                self._write_hashcache(cachepath, stamp, digest)
+        return digest
+
+    @staticmethod
+    def _write_hashcache(cachepath, stamp, digest):
+        dirname = os.path.dirname(cachepath)
+        mkdirp(dirname)
+        (fd, temppath) = tempfile.mkstemp(dir=dirname, prefix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump([list(stamp), digest], f)
+        os.rename(temppath, cachepath)
 
     def open(self, *args, **kwds):
-        self.stream = open(self.path, *args, **kwds)
+        """
+        Open the file.  Arguments are passed to the builtin `open`.
+
+        If a keyword argument ``mmap=True`` is given, return
+        :meth:`mmap` instead of a file object.
+
+        """
+        if kwds.pop('mmap', False):
+            if any(c in ''.join(args[:1] or [kwds.get('mode', 'r')])
+                   for c in 'wa+'):
+                raise ValueError('mmap=True is only for reading.')
+            self.stream = self.mmap()
+        else:
+            self.stream = self._open(*args, **kwds)
         return self.stream
 
+    def mmap(self):
+        """
+        Return a read-only memory map of the file.
+
+        >>> import tempfile
+        >>> from contextlib import closing
+        >>> with tempfile.NamedTemporaryFile() as temp:
+        ...     ds = DataFile(temp.name)
+        ...     with ds.open('wb') as f:
+        ...         _ = f.write(b'some data')
+        ...     with closing(ds.mmap()) as m:
+        ...         print(m[5:].decode())
+        data
+
+        The content is not copied into memory.  Processes mapping the
+        same file share its pages in the page cache.  Note that the
+        returned object must not be used after the file is modified.
+        For an empty file, which can't be mapped, an empty byte string
+        is returned.
+
+        """
+        if not self._mmappable:
+            raise ValueError("{0} can't be memory-mapped."
+                             .format(self.__class__.__name__))
+        with open(self.path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b''
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __getstate__(self):
+        # File object can't be pickled (in Python 3).
+        state = self.__dict__.copy()
+        state.pop('stream', None)
+        return state
+
 
 class _DataDirectory(BaseDataDirectory):
 
@@ -58,10 +186,30 @@ class _DataDirectory(BaseDataDirectory):
     metakey = METAKEY
     # this is needed to use this class w/o MixInDataStoreNestableMetaInKey.
 
+    shardlevels = 0
+    """
+    Number of levels of shard directories.
+
+    When this is not zero, each entry is stored under `shardlevels`
+    levels of subdirectories named by the prefix of the digest of its
+    name, like ``ab/cd/name`` (for ``shardlevels = 2``).  This keeps
+    the number of entries in each directory small.  Sharding does
+    not change the keys.
+
+    """
+
+    shardwidth = 2
+    """
+    Number of hexadecimal digits in the name of a shard directory.
+    """
+
     def __init__(self, *args, **kwds):
         super(_DataDirectory, self).__init__(*args, **kwds)
         mkdirp(self.path)
         self.__store = {}
+        self.__inferred = set()
+        self.__valuetypes = None
+        self.__scanned = None
 
     def get_metastorepath(self):
         return os.path.join(self.path, self.metakey)
@@ -70,44 +218,309 @@ class _DataDirectory(BaseDataDirectory):
     def default_metastore_kwds(self):
         return dict(path=self.get_metastorepath())
 
+    def shardpath(self, name):
+        """
+        Return `name` prefixed by shard directories.
+
+        >>> class ShardedDirectory(DataDirectory):
+        ...     shardlevels = 2
+        >>> from buildlet.utils.tempdir import TemporaryDirectory
+        >>> with TemporaryDirectory() as tempdir:
+        ...     ds = ShardedDirectory(tempdir)
+        ...     print(ds.shardpath('key').replace(os.path.sep, '/'))
+        3c/6e/key
+
+        """
+        if not self.shardlevels:
+            return name
+        digest = hexdigest([name])
+        width = self.shardwidth
+        shards = [digest[i * width:(i + 1) * width]
+                  for i in range(self.shardlevels)]
+        return os.path.join(*(shards + [name]))
+
     def aspath(self, key):
-        return os.path.join(self.path, key)
+        return os.path.join(self.path, self.shardpath(key))
+
+    # ---------------------------------------------------------------------
+    # Discovery of existing entries
+    # ---------------------------------------------------------------------
+
+    def get_valuetypespath(self):
+        return os.path.join(self.get_metastorepath(), 'valuetypes')
+
+    def get_hashcachedir(self):
+        """
+        Return the directory to cache hashes of the files in it.
+
+        See :attr:`DataFile.hashcachedir`.
+
+        """
+        return os.path.join(self.get_metastorepath(), 'filehash')
+
+    def record_valuetype(self, path, store):
+        """
+        Record the type of value `store` located at `path`.
+
+        The record is used by :meth:`infer_store` to find out the type
+        of the entry when this directory is reopened.
+
+        """
+        name = os.path.basename(path)
+        cls = store.__class__
+        tag = '{0}:{1}'.format(cls.__module__, cls.__name__)
+        valuetypes = self._load_valuetypes()
+        if valuetypes.get(name) == tag:
+            return
+        valuetypes[name] = tag
+        mkdirp(self.get_metastorepath())
+        with open(self.get_valuetypespath(), 'a') as f:
+            f.write(json.dumps([name, tag]) + '\n')
+
+    def _load_valuetypes(self, reload=False):
+        if self.__valuetypes is None or reload:
+            self.__valuetypes = valuetypes = {}
+            if os.path.exists(self.get_valuetypespath()):
+                with open(self.get_valuetypespath()) as f:
+                    for line in f:
+                        if line.endswith('\n'):
+                            (name, tag) = json.loads(line)
+                            valuetypes[name] = tag
+        return self.__valuetypes
+
+    def infer_store(self, path, reload=True):
+        """
+        Create a data store for an existing entry at `path`.
+
+        A directory is loaded as a sub-data store
+        (:attr:`default_substore_type`).  A file is loaded as a value
+        store when its type is recorded by :meth:`record_valuetype`,
+        otherwise as a stream (:attr:`default_streamstore_type`).
+
+        """
+        if os.path.isdir(path):
+            return self.default_substore_type(path=path)
+        name = os.path.basename(path)
+        valuetypes = self._load_valuetypes()
+        if name not in valuetypes and reload:
+            # Maybe recorded by another instance
+            valuetypes = self._load_valuetypes(reload=True)
+        dstype = resolve_tag(valuetypes.get(name)) or \
+            self.default_streamstore_type
+        store = dstype(path=path)
+        if isinstance(store, DataFile):
+            store.hashcachedir = self.get_hashcachedir()
+        return store
+
+    def find_path(self, key):
+        """
+        Return the path of existing entry for `key` or None.
+        """
+        path = self.aspath(key)
+        if os.path.exists(path):
+            return path
+
+    def iter_dirs(self):
+        """
+        Return a list of lists of directories for each shard level.
+
+        The first list is ``[self.path]`` and the last one contains
+        the directories of the entries.
+
+        """
+        levels = [[self.path]]
+        for _ in range(self.shardlevels):
+            levels.append([p for d in levels[-1]
+                           for (n, p, isdir) in scandir(d)
+                           if isdir and len(n) == self.shardwidth])
+        return levels
+
+    def liststamp(self):
+        """
+        Return a stamp which changes when an entry is added or removed.
+
+        It is made of the inode number and the modification time of
+        the directory and its shard directories.
+
+        """
+        stamps = []
+        for dirs in self.iter_dirs():
+            for d in dirs:
+                try:
+                    st = os.stat(d)
+                except OSError:
+                    continue
+                stamps.append((d, st.st_ino,
+                               getattr(st, 'st_mtime_ns', st.st_mtime)))
+        return tuple(stamps)
+
+    def iter_names(self):
+        """
+        Yield names of existing entries, using :func:`os.scandir`.
+        """
+        for d in self.iter_dirs()[-1]:
+            for (name, _, _) in scandir(d):
+                if name != self.metakey and not name.startswith(TEMPPREFIX):
+                    yield name
+
+    def _discover(self, key):
+        path = self.find_path(key)
+        if path is None:
+            raise KeyError(key)
+        store = self.__store[key] = self.infer_store(path)
+        self.__inferred.add(key)
+        return store
+
+    def _scan(self):
+        """
+        Load all existing entries at once.
+
+        It is done again when entries are added or removed by other
+        instances (see :meth:`liststamp`).
+
+        """
+        liststamp = self.liststamp()
+        if liststamp == self.__scanned:
+            return
+        self._load_valuetypes(reload=True)
+        names = set(self.iter_names())
+        for name in names:
+            if name not in self.__store:
+                self.__store[name] = self.infer_store(
+                    self.aspath(name), reload=False)
+                self.__inferred.add(name)
+        for name in list(self.__inferred):
+            if name not in names:
+                del self.__store[name]
+                self.__inferred.discard(name)
+        self.__scanned = liststamp
+
+    def get_substore(self, key, dstype=None, dskwds={}, **kwds):
+        if key not in self.__store:
+            try:
+                self._discover(key)
+            except KeyError:
+                pass
+        if key in self.__inferred:
+            dstype = dstype or self.default_substore_type
+            store = self.__store[key]
+            if isinstance(store, dstype):
+                self.__inferred.discard(key)
+            elif not (isinstance(store, BaseDataStoreNestable) or
+                      issubclass(dstype, BaseDataStoreNestable)):
+                # Type of inferred file may be wrong (stream or value
+                # of some type).  Replace it with the requested one.
+                self._set_store(key, dstype(
+                    **dict(dict(path=store.path), **dskwds)))
+            else:
+                # Directory vs. file.  Refuse to override it as
+                # `__setitem__` does.
+                raise self._unknown_entry_error(
+                    key, issubclass(dstype, BaseDataDirectory))
+        return super(_DataDirectory, self).get_substore(
+            key, dstype=dstype, dskwds=dskwds, **kwds)
+
+    def _is_known(self, key):
+        """
+        Return True if `key` is set in this instance (not inferred).
+        """
+        return key in self.__store and key not in self.__inferred
+
+    @staticmethod
+    def _unknown_entry_error(key, isdir):
+        if isdir:
+            return KeyError(
+                "{0!r}: Trying to set directory type, but"
+                "unknown non-directory file exists already."
+                .format(key))
+        else:
+            return KeyError(
+                "{0!r}: Trying to set file/value type, but"
+                "unknown directory exists already."
+                .format(key))
+
+    # ---------------------------------------------------------------------
+    # Mapping interface
+    # ---------------------------------------------------------------------
 
     def __iter__(self):
-        return iter(self.__store)
+        self._scan()
+        return iter(list(self.__store))
+
+    def __len__(self):
+        self._scan()
+        return len(self.__store)
 
     def __delitem__(self, key):
-        store = self.__store[key]
+        store = self._lookup(key)
         store.clear()
         del self.__store[key]
+        self.__inferred.discard(key)
+
+    def _lookup(self, key):
+        try:
+            return self.__store[key]
+        except KeyError:
+            return self._discover(key)
 
     def __getitem__(self, key):
-        return self.__store[key]
+        return self._lookup(key)
 
     def __setitem__(self, key, value):
         assert_datastore(value, ValueError)
         path = self.aspath(key)
         if isinstance(value, BaseDataDirectory) and \
            os.path.exists(path) and not os.path.isdir(path):
-            if key not in self:
-                raise KeyError(
-                    "{0!r}: Trying to set directory type, but"
-                    "unknown non-directory file exists already."
-                    .format(key))
+            if not self._is_known(key):
+                raise self._unknown_entry_error(key, True)
             else:
                 # streamstore or valuestore
-                self._get_store(key).clean()
+                self._get_store(key).clear()
         elif isinstance(value, (DataFile, BaseDataValueAutoSerialize)) and \
              os.path.isdir(path):
-            if key not in self:
-                raise KeyError(
-                    "{0!r}: Trying to set file/value type, but"
-                    "unknown directory exists already."
-                    .format(key))
+            if not self._is_known(key):
+                raise self._unknown_entry_error(key, False)
             else:
                 # nestable store
-                self._get_store(key).clean()
+                self._get_store(key).clear()
+        if self.shardlevels:
+            mkdirp(os.path.dirname(path))
+        if isinstance(value, BaseDataValue):
+            self.record_valuetype(path, value)
+        elif isinstance(value, DataFile):
+            value.hashcachedir = self.get_hashcachedir()
         self.__store[key] = value
+        self.__inferred.discard(key)
+
+
+def scandir(path):
+    """
+    Yield ``(name, path, isdir)`` of entries in directory `path`.
+    """
+    if not os.path.isdir(path):
+        return
+    if hasattr(os, 'scandir'):
+        for entry in os.scandir(path):
+            yield (entry.name, entry.path, entry.is_dir())
+    else:
+        # Python < 3.5
+        for name in os.listdir(path):
+            p = os.path.join(path, name)
+            yield (name, p, os.path.isdir(p))
+
+
+def resolve_tag(tag):
+    """
+    Return a class from `tag` (``'module:name'``) or None.
+    """
+    if not tag:
+        return None
+    (modname, name) = tag.split(':', 1)
+    try:
+        __import__(modname)
+        return getattr(sys.modules[modname], name)
+    except (ImportError, AttributeError):
+        return None
 
 
 class DataDirectory(MixInDataStoreNestableMetaInKey, _DataDirectory):
@@ -58,7 +58,7 @@ class DataValuePickledInMemory(DataValueInMemory):
     """
 
     def set(self, value):
-        self._value = pickle.dumps(value)
+        self._value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
 
     def get(self):
         return pickle.loads(self._value)
@@ -171,6 +171,15 @@ class MixInNestableTestCase(BaseMixnInTestCase):
     def test_keyerror(self):
         self.assertRaises(KeyError, lambda: self.ds['non_existing_key'])
 
+    def test_get_delete_many(self):
+        keys = ['k{0}'.format(i) for i in range(5)]
+        stores = [self.ds.get_filestore(k) for k in keys]
+        got = self.ds.get_many(keys)
+        self.assertTrue(all(a is b for (a, b) in zip(got, stores)))
+        self.assertRaises(KeyError, self.ds.get_many, ['non_existing_key'])
+        self.ds.delete_many(keys[:3])
+        self.assertEqual(sorted(self.ds), keys[3:])
+
     def test_substore_is_cached_in_memory(self):
         key_allocator_list = self.get_key_allocator_list()
         key_store_list = []
@@ -269,6 +278,19 @@ class MixInNestableAutoValueTestCase(MixInNestableTestCase):
         # this test does not work for value store.
         return filter(lambda x: 'valuestore' in x[0], kal)
 
+    def test_set_get_delete_many(self):
+        for concurrency in [None, 4]:
+            items = [('k{0}'.format(i), {'i': i}) for i in range(10)]
+            keys = [k for (k, _) in items]
+            self.ds.set_many(items, concurrency=concurrency)
+            self.assertEqual(self.ds.get_many(keys, concurrency=concurrency),
+                             [v for (_, v) in items])
+            self.ds.set_many(dict(k0='new'))
+            self.assertEqual(self.ds.get_many(['k0']), ['new'])
+            self.ds.delete_many(keys)
+            for k in keys:
+                self.assertRaises(KeyError, self.ds.__getitem__, k)
+
     def test_not_yet_set_valuestore_keyerror(self):
         key = 'key_value'
         # allocate valuestore but don't set value
@@ -300,3 +322,78 @@ class MixInWithTempFile(MixInWithTempDirectory):
 
     def setup_datastore(self):
         self.ds = self.dstype(self.tempfilename)
+
+
+class MixInReopenTestCase(MixInWithTempDirectory):
+
+    """
+    Test for file-based nestable data store reopened by a new instance.
+    """
+
+    def make_entries(self):
+        ds = self.ds
+        ds.get_substore('sub').get_filestore('file').open('w').close()
+        with ds.get_filestore('stream').open('w') as f:
+            f.write('data')
+        ds.get_valuestore('value').set([1, 2])
+
+    def test_reopen(self):
+        self.make_entries()
+        reds = self.dstype(self.tempdir)
+        self.assertEqual(sorted(reds), ['stream', 'sub', 'value'])
+        self.assertEqual(len(reds), 3)
+        sub = reds._get_store('sub')
+        assert isinstance(sub, self.dstype)
+        self.assertEqual(list(sub), ['file'])
+        assert isinstance(reds._get_store('stream'),
+                          reds.default_streamstore_type)
+        with reds._get_store('stream').open() as f:
+            self.assertEqual(f.read(), 'data')
+        self.assertEqual(reds._get_store('value').get(), [1, 2])
+        self.assertEqual(reds.hash(), self.ds.hash())
+
+    def test_reopen_lookup(self):
+        self.make_entries()
+        reds = self.dstype(self.tempdir)
+        self.assertEqual(reds.get_valuestore('value').get(), [1, 2])
+        self.assertRaises(KeyError, reds._get_store, 'missing')
+        self.assertEqual(sorted(reds), ['stream', 'sub', 'value'])
+
+    def test_reopen_override_inferred(self):
+        self.make_entries()
+        os.remove(self.ds.get_valuetypespath())
+        reds = self.dstype(self.tempdir)
+        # W/o record, value store is inferred as a stream...
+        assert isinstance(reds._get_store('value'),
+                          reds.default_streamstore_type)
+        # ...but it can be requested as a value store.
+        self.assertEqual(reds.get_valuestore('value').get(), [1, 2])
+        # ...and the type is recorded for the next instance.
+        thirdds = self.dstype(self.tempdir)
+        assert isinstance(thirdds._get_store('value'),
+                          thirdds.default_valuestore_type)
+
+    def test_see_changes_by_another_instance(self):
+        self.make_entries()
+        self.assertEqual(sorted(self.ds), ['stream', 'sub', 'value'])
+        stamp = self.ds.stamp()
+        other = self.dstype(self.tempdir)
+        other.get_filestore('new').open('w').close()
+        self.assertNotEqual(self.ds.stamp(), stamp)
+        self.assertEqual(sorted(self.ds), ['new', 'stream', 'sub', 'value'])
+        self.assertEqual(len(self.ds), 4)
+        stamp = self.ds.stamp()
+        del other['new']
+        self.assertNotEqual(self.ds.stamp(), stamp)
+        self.assertEqual(sorted(self.ds), ['stream', 'sub', 'value'])
+
+    def test_reopen_type_mismatch(self):
+        self.make_entries()
+        reds = self.dstype(self.tempdir)
+        # Directory can't be overridden by a file or a value...
+        self.assertRaises(KeyError, reds.get_filestore, 'sub')
+        self.assertRaises(KeyError, reds.get_valuestore, 'sub')
+        # ...and vice versa.
+        self.assertRaises(KeyError, reds.get_substore, 'stream')
+        self.assertEqual(sorted(reds), ['stream', 'sub', 'value'])
+        self.assertEqual(list(reds._get_store('sub')), ['file'])
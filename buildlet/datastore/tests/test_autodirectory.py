@@ -1,18 +1,177 @@
+import os
+import tempfile
+import shutil
+import time
 import unittest
+import threading
+import multiprocessing
 
-from ..autodirectory import DataAutoDirectory, DataAutoDirectoryWithMagic
+from ...kvstore.sqlitestore import KVStoreSQLite
+from ..autodirectory import (
+    DataAutoDirectory, DataAutoDirectoryWithMagic,
+    DataDigestDirectory, DataDigestDirectoryWithMagic,
+)
 from .mixintestcase import (
     MixInNestableTestCase, MixInWithTempDirectory,
-    MixInNestableAutoValueTestCase,
+    MixInNestableAutoValueTestCase, MixInReopenTestCase,
 )
 
 
-class TestDataAutoDirectory(MixInNestableTestCase, MixInWithTempDirectory,
+class TestDataAutoDirectory(MixInNestableTestCase, MixInReopenTestCase,
                             unittest.TestCase):
     dstype = DataAutoDirectory
 
+    def test_str_and_unicode_keys(self):
+        sub = self.ds.get_substore('key')
+        ds = self.dstype(self.ds.path)
+        self.assertEqual(ds.get_substore(u'key').path, sub.path)
+        self.assertEqual(len(ds), 1)
+
 
 class TestDataAutoDirectoryWithMagic(MixInNestableAutoValueTestCase,
                                      MixInWithTempDirectory,
                                      unittest.TestCase):
     dstype = DataAutoDirectoryWithMagic
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.ds = DataAutoDirectoryWithMagic(self.tempdir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def count_calls(self, obj, name):
+        calls = []
+        orig = getattr(obj, name)
+
+        def wrapper(*args, **kwds):
+            calls.append(args)
+            return orig(*args, **kwds)
+        setattr(obj, name, wrapper)
+        return calls
+
+    def test_one_sync_per_batch(self):
+        keypathmap = self.ds.keypathmap
+        loads = self.count_calls(keypathmap, '_sync_load')
+        dumps = self.count_calls(keypathmap, '_sync_dump')
+        items = [('k{0}'.format(i), i) for i in range(50)]
+        self.ds.set_many(items, concurrency=4)
+        self.assertEqual((len(loads), len(dumps)), (1, 1))
+        self.assertEqual(self.ds.get_many([k for (k, _) in items]),
+                         [v for (_, v) in items])
+        self.ds.delete_many([k for (k, _) in items])
+        self.assertEqual((len(loads), len(dumps)), (3, 3))
+        self.assertEqual(len(DataAutoDirectoryWithMagic(self.tempdir)), 0)
+
+
+class DataAutoDirectorySQLite(DataAutoDirectory):
+    KeyPathMapClass = KVStoreSQLite
+
+
+class TestDataAutoDirectorySQLite(TestDataAutoDirectory):
+    dstype = DataAutoDirectorySQLite
+
+    def test_racing_instances(self):
+        other = self.dstype(self.tempdir)
+        allocating = threading.Event()
+        newpath = self.ds.newpath
+        paths = {}
+
+        def slow_newpath():
+            allocating.set()
+            time.sleep(0.2)
+            return newpath()
+        self.ds.newpath = slow_newpath
+
+        def other_getpath():
+            allocating.wait()
+            paths['other'] = other.getpath('key')
+        thread = threading.Thread(target=other_getpath)
+        thread.start()
+        paths['self'] = self.ds.getpath('key')
+        thread.join()
+        self.assertEqual(paths['other'], paths['self'])
+        self.assertEqual(other.keypathmap['key'], paths['self'])
+
+
+class TestDataDigestDirectory(TestDataAutoDirectory):
+    dstype = DataDigestDirectory
+
+    def test_digest_path(self):
+        key = ('some', ('complex', 'key'), 1)
+        sub = self.ds.get_substore(key)
+        # Another instance finds the same path w/o reading a shared file
+        ds = self.dstype(self.ds.path)
+        self.assertEqual(ds.aspath(key), sub.path)
+        self.assertEqual(os.path.dirname(sub.path), self.ds.path)
+        self.assertEqual(list(ds), [key])
+
+
+class TestDataDigestDirectoryWithMagic(TestDataAutoDirectoryWithMagic):
+    dstype = DataDigestDirectoryWithMagic
+
+
+class ShardedDataAutoDirectory(DataAutoDirectory):
+    shardlevels = 1
+
+
+class TestShardedDataAutoDirectory(TestDataAutoDirectory):
+    dstype = ShardedDataAutoDirectory
+
+    def test_sharded_layout(self):
+        sub = self.ds.get_substore(('some', 'key'))
+        relpath = os.path.relpath(sub.path, self.ds.path)
+        (shard, name) = relpath.split(os.path.sep)
+        self.assertEqual(shard, self.ds.shardpath(name).split(os.path.sep)[0])
+        self.assertEqual(name, self.ds.getpath(('some', 'key')))
+
+
+class ShardedDataDigestDirectoryWithMagic(DataDigestDirectoryWithMagic):
+    shardlevels = 2
+
+
+class TestShardedDataDigestDirectoryWithMagic(
+        TestDataDigestDirectoryWithMagic):
+    dstype = ShardedDataDigestDirectoryWithMagic
+
+
+def allocate_paths(path):
+    ds = DataAutoDirectory(path)
+    return [ds.newpath() for _ in range(50)]
+
+
+class TestNewPath(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.ds = DataAutoDirectory(self.tempdir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_sequential(self):
+        paths = [self.ds.getpath(('key', i)) for i in range(20)]
+        self.assertEqual(paths, ['{0:03x}'.format(i) for i in range(20)])
+
+    def test_legacy_directory(self):
+        for i in range(3):
+            self.ds.get_substore(('key', i))
+        # Directory made without the counter file
+        os.remove(self.ds.get_pathcounterpath())
+        ds = DataAutoDirectory(self.tempdir)
+        with ds.keypathmap.autosync():
+            self.assertEqual(ds.getpath('new'), '003')
+
+    def test_concurrent_processes(self):
+        num = 4
+        pool = multiprocessing.Pool(num)
+        try:
+            results = pool.map(allocate_paths, [self.tempdir] * num)
+        finally:
+            pool.close()
+            pool.join()
+        paths = sum(results, [])
+        self.assertEqual(len(set(paths)), num * 50)
@@ -1,6 +1,13 @@
+import os
 import unittest
 
-from ..autoserialize import DataValuePickle, DataValueJSON, DataValueYAML
+import numpy
+
+from ...utils import _pickle
+from ..autoserialize import (
+    DataValuePickle, DataValueJSON, DataValueYAML, DataValueNumpy,
+    DataValueBytes, OUTOFBAND_MAGIC)
+from ..directory import DataDirectoryWithMagic
 from .mixintestcase import MixInValueTestCase, MixInWithTempFile
 
 
@@ -8,6 +15,62 @@ class TestDataValuePickle(MixInValueTestCase, MixInWithTempFile,
                           unittest.TestCase):
     dstype = DataValuePickle
 
+    def is_outofband(self):
+        with open(self.tempfilename, 'rb') as f:
+            return f.read(len(OUTOFBAND_MAGIC)) == OUTOFBAND_MAGIC
+
+    def test_plain_pickle(self):
+        with open(self.tempfilename, 'wb') as f:
+            _pickle.dump({'a': 1}, f, 2)
+        self.assertEqual(self.ds.get(), {'a': 1})
+
+    def test_no_buffers_is_plain_pickle(self):
+        self.ds.set({'a': 1})
+        self.assertFalse(self.is_outofband())
+
+
+if _pickle.HIGHEST_PROTOCOL >= 5:
+    # Out-of-band buffers require pickle protocol 5.
+    class TestDataValuePickleOutOfBand(TestDataValuePickle):
+
+        def test_outofband(self):
+            data = dict(array=numpy.arange(1000.0),
+                        strided=numpy.arange(10)[::2],
+                        bytearray=bytearray(b'abc'), text='text')
+            self.ds.set(data)
+            self.assertTrue(self.is_outofband())
+            loaded = self.ds.get()
+            self.assertEqual(sorted(loaded), sorted(data))
+            for key in data:
+                numpy.testing.assert_equal(loaded[key], data[key])
+            # The array is a view of (copy-on-write) memory map
+            self.assertFalse(loaded['array'].flags.owndata)
+            loaded['array'][0] = 1
+            self.assertEqual(self.ds.get()['array'][0], 0)
+
+        def test_outofband_set_loaded(self):
+            self.ds.set(dict(array=numpy.arange(1000.0)))
+            loaded = self.ds.get()
+            loaded['array'][0] = 5
+            self.ds.set(loaded)
+            expected = numpy.arange(1000.0)
+            expected[0] = 5
+            numpy.testing.assert_equal(self.ds.get()['array'], expected)
+            self.assertEqual(os.listdir(self.tempdir), ['tempfile'])
+
+        def test_outofband_overwrite_loaded(self):
+            self.ds.set(dict(array=numpy.arange(1000.0)))
+            loaded = self.ds.get()
+            self.ds.set(dict(array=numpy.zeros(10)))
+            numpy.testing.assert_equal(loaded['array'], numpy.arange(1000.0))
+            numpy.testing.assert_equal(self.ds.get()['array'], numpy.zeros(10))
+
+        def test_outofband_disabled(self):
+            self.ds.outofband = False
+            self.ds.set(numpy.arange(3))
+            self.assertFalse(self.is_outofband())
+            numpy.testing.assert_equal(self.ds.get(), numpy.arange(3))
+
 
 class TestDataValueJSON(MixInValueTestCase, MixInWithTempFile,
                         unittest.TestCase):
@@ -17,3 +80,94 @@ class TestDataValueJSON(MixInValueTestCase, MixInWithTempFile,
 class TestDataValueYAML(MixInValueTestCase, MixInWithTempFile,
                         unittest.TestCase):
     dstype = DataValueYAML
+
+
+class TestDataValueBytes(MixInValueTestCase, MixInWithTempFile,
+                        unittest.TestCase):
+    dstype = DataValueBytes
+
+    def test_set_get(self):
+        data = b'\x00some data\xff'
+        self.ds.set(data)
+        self.assertEqual(self.ds.get(), data)
+
+
+class TestDataValueNumpy(MixInValueTestCase, MixInWithTempFile,
+                         unittest.TestCase):
+    dstype = DataValueNumpy
+
+    def test_array_is_memmapped(self):
+        data = numpy.arange(12.0).reshape(3, 4)
+        self.ds.set(data)
+        loaded = self.ds.get()
+        assert isinstance(loaded, numpy.memmap)
+        self.assertFalse(loaded.flags.writeable)
+        numpy.testing.assert_equal(loaded, data)
+
+    def test_fortran_order(self):
+        data = numpy.asfortranarray(numpy.arange(6).reshape(2, 3))
+        self.ds.set(data)
+        numpy.testing.assert_equal(self.ds.get(), data)
+
+    def test_dict_of_arrays(self):
+        data = dict(a=numpy.arange(3), b=numpy.ones((2, 2)), c=numpy.zeros(0))
+        self.ds.set(data)
+        loaded = self.ds.get()
+        self.assertEqual(sorted(loaded), ['a', 'b', 'c'])
+        for key in data:
+            numpy.testing.assert_equal(loaded[key], data[key])
+        assert isinstance(loaded['b'], numpy.memmap)
+
+    def test_dict_key_file(self):
+        data = {'file': numpy.arange(3), 'allow_pickle': numpy.ones(2)}
+        self.ds.set(data)
+        loaded = self.ds.get()
+        self.assertEqual(sorted(loaded), ['allow_pickle', 'file'])
+        for key in data:
+            numpy.testing.assert_equal(loaded[key], data[key])
+
+    def test_set_loaded(self):
+        self.ds.set(numpy.arange(1000.0))
+        self.ds.set(self.ds.get())
+        numpy.testing.assert_equal(self.ds.get(), numpy.arange(1000.0))
+        self.ds.set(dict(a=numpy.arange(1000.0)))
+        self.ds.set(self.ds.get())
+        numpy.testing.assert_equal(self.ds.get()['a'], numpy.arange(1000.0))
+
+    def test_overwrite_loaded(self):
+        self.ds.set(numpy.arange(1000.0))
+        loaded = self.ds.get()
+        self.ds.set(numpy.zeros(10))
+        numpy.testing.assert_equal(loaded, numpy.arange(1000.0))
+        numpy.testing.assert_equal(self.ds.get(), numpy.zeros(10))
+
+    def test_compressed_npz(self):
+        with open(self.tempfilename, 'wb') as fp:
+            numpy.savez_compressed(fp, a=numpy.arange(3))
+        numpy.testing.assert_equal(self.ds.get()['a'], numpy.arange(3))
+
+    def test_object_array(self):
+        data = numpy.array([{'a': 1}, None], dtype=object)
+        self.ds.set(data)
+        self.assertEqual(list(self.ds.get()), list(data))
+
+    def test_no_mmap(self):
+        self.ds.mmap_mode = None
+        self.ds.set(numpy.arange(3))
+        self.assertEqual(type(self.ds.get()), numpy.ndarray)
+
+
+class ArrayDirectory(DataDirectoryWithMagic):
+    default_valuestore_type = DataValueNumpy
+
+
+class TestArrayDirectory(unittest.TestCase):
+
+    def test_set_get(self):
+        from ...utils.tempdir import TemporaryDirectory
+        with TemporaryDirectory() as tempdir:
+            ds = ArrayDirectory(tempdir)
+            ds['key'] = numpy.arange(3)
+            numpy.testing.assert_equal(ds['key'], numpy.arange(3))
+            reds = ArrayDirectory(tempdir)
+            assert isinstance(reds['key'], numpy.memmap)
@@ -0,0 +1,152 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+from ..compressed import (
+    DataFileCompressed, DataValuePickleCompressed, DataValueJSONCompressed)
+from ..directory import DataDirectory, DataDirectoryWithMagic
+from .mixintestcase import (
+    MixInStreamTestCase, MixInValueTestCase, MixInWithTempFile)
+
+no_lzma = sys.version_info[0] < 3
+
+
+class MixInCompressedTestCase(MixInWithTempFile):
+
+    compression = 'gzip'
+
+    def setup_datastore(self):
+        self.ds = self.dstype(self.tempfilename, compression=self.compression)
+
+    def test_compressed(self):
+        data = 'some text ' * 1000
+        self.ds.set(data)
+        self.assertTrue(
+            os.path.getsize(self.tempfilename) < len(data) // 10)
+        self.assertEqual(self.ds.get(), data)
+
+
+class TestDataValuePickleCompressed(MixInCompressedTestCase,
+                                    MixInValueTestCase, unittest.TestCase):
+    dstype = DataValuePickleCompressed
+
+
+class TestDataValueJSONCompressed(MixInCompressedTestCase,
+                                  MixInValueTestCase, unittest.TestCase):
+    dstype = DataValueJSONCompressed
+
+
+class TestDataValuePickleCompressedOutOfBand(TestDataValuePickleCompressed):
+
+    def test_outofband(self):
+        import numpy
+        data = dict(array=numpy.arange(1000.0), bytearray=bytearray(b'abc'))
+        self.ds.set(data)
+        loaded = self.ds.get()
+        for key in data:
+            numpy.testing.assert_equal(loaded[key], data[key])
+
+
+class TestDataValuePickleBZ2(TestDataValuePickleCompressed):
+    compression = 'bz2'
+
+
+if not no_lzma:
+    class TestDataValuePickleLZMA(TestDataValuePickleCompressed):
+        compression = 'lzma'
+
+
+class TestDataFileCompressed(MixInStreamTestCase, MixInWithTempFile,
+                             unittest.TestCase):
+
+    dstype = DataFileCompressed
+
+    def test_write_read(self):
+        data = 'some text'.encode()
+        with self.ds.open('wb') as f:
+            f.write(data)
+        self.assertTrue(self.ds.stream.closed)
+
+        with self.ds.open('rb') as f:
+            written = f.read()
+        self.assertEqual(written, data)
+
+    def test_text_mode(self):
+        with self.ds.open('wt') as f:
+            f.write('line 1\nline 2\n')
+        with self.ds.open('rt') as f:
+            self.assertEqual(list(f), ['line 1\n', 'line 2\n'])
+
+    def test_readwrite_mode_is_not_supported(self):
+        self.assertRaises(ValueError, self.ds.open, 'w+b')
+        self.test_write_read()
+        self.assertRaises(ValueError, self.ds.open, mmap=True)
+
+    def test_hash_depends_only_on_data(self):
+        other = self.dstype(self.tempfilename + '-other')
+        for ds in [self.ds, other]:
+            with ds.open('wb') as f:
+                f.write('some text'.encode())
+        self.assertEqual(self.ds.hash(), other.hash())
+
+    def test_unknown_compression(self):
+        self.assertRaises(ValueError, self.dstype, self.tempfilename,
+                          compression='unknown')
+
+
+class TestDetectCompression(unittest.TestCase):
+
+    dstype = DataValuePickleCompressed
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.tempfilename = os.path.join(self.tempdir, 'tempfile')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def check_read_by_default_store(self, compression):
+        ds = self.dstype(self.tempfilename, compression=compression)
+        ds.set([1, 2])
+        self.assertEqual(self.dstype(self.tempfilename).get(), [1, 2])
+
+    def test_gzip(self):
+        self.check_read_by_default_store('gzip')
+
+    def test_bz2(self):
+        self.check_read_by_default_store('bz2')
+
+    def test_lzma(self):
+        if no_lzma:
+            return
+        self.check_read_by_default_store('lzma')
+
+    def test_reopened_directory(self):
+        ds = DataDirectoryWithMagic(self.tempdir)
+        ds.get_valuestore('key', DataValuePickleCompressed,
+                          dict(compression='bz2')).set([1, 2])
+        self.assertEqual(DataDirectoryWithMagic(self.tempdir)['key'], [1, 2])
+
+
+class CompressedDirectory(DataDirectory):
+    default_streamstore_type = DataFileCompressed
+    default_valuestore_type = DataValuePickleCompressed
+
+
+class TestCompressedDirectory(MixInWithTempFile, unittest.TestCase):
+
+    dstype = CompressedDirectory
+
+    def set_some_value(self):
+        self.ds.get_valuestore('value').set([1, 2])
+
+    def test_reopen(self):
+        self.set_some_value()
+        with self.ds.get_filestore('stream').open('wb') as f:
+            f.write('data'.encode())
+        reds = self.dstype(self.tempfilename)
+        self.assertEqual(reds.get_valuestore('value').get(), [1, 2])
+        with reds['stream'].open('rb') as f:
+            self.assertEqual(f.read(), 'data'.encode())
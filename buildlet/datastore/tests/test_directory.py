@@ -1,9 +1,19 @@
+import os
+import shutil
+import tempfile
 import unittest
 
+import numpy
+
+from ...utils.hashutils import hexdigest, filedigest
+from .. import directory
+from ..autoserialize import (
+    VALUESTORE_TYPES, DataValueBytes, DataValueNumpy, DataValuePickle,
+    DataValueYAML)
 from ..directory import DataFile, DataDirectory, DataDirectoryWithMagic
 from .mixintestcase import (
     MixInStreamTestCase, MixInNestableTestCase, MixInNestableAutoValueTestCase,
-    MixInWithTempFile, MixInWithTempDirectory,
+    MixInWithTempFile, MixInWithTempDirectory, MixInReopenTestCase,
 )
 
 
@@ -11,7 +21,115 @@ class TestDataFile(MixInStreamTestCase, MixInWithTempFile, unittest.TestCase):
     dstype = DataFile
 
 
-class TestDataDirectory(MixInNestableTestCase, MixInWithTempDirectory,
+class TestDataFileHash(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.tempfilename = os.path.join(self.tempdir, 'tempfile')
+        self.ds = DataDirectory(self.tempdir).get_filestore('tempfile')
+
+    def tearDown(self):
+        directory.filedigest = filedigest
+        shutil.rmtree(self.tempdir)
+
+    def write(self, data):
+        with self.ds.open('w') as f:
+            f.write(data)
+
+    def count_filedigest(self):
+        calls = []
+
+        def counting_filedigest(path, *args):
+            calls.append(path)
+            return filedigest(path, *args)
+        directory.filedigest = counting_filedigest
+        return calls
+
+    def test_content_hash(self):
+        self.assertEqual(self.ds.hash(), None)
+        self.write('data')
+        self.assertEqual(self.ds.hash(), filedigest(self.tempfilename))
+        other = DataFile(os.path.join(self.tempdir, 'other'))
+        with other.open('w') as f:
+            f.write('data')
+        self.assertEqual(other.hash(), self.ds.hash())
+
+    def test_chunked(self):
+        self.write('data' * 100)
+        digest = self.ds.hash()
+        self.ds.clear()
+        self.write('data' * 100)
+        self.ds.hashchunksize = 7
+        self.assertEqual(self.ds.hash(), digest)
+
+    def test_cached_hash_is_reused(self):
+        self.write('data')
+        calls = self.count_filedigest()
+        digest = self.ds.hash()
+        assert os.path.exists(self.ds.get_hashcachepath())
+        # New instance (e.g., in another process) uses the cache
+        reds = DataDirectory(self.tempdir)
+        self.assertEqual(reds.get_filestore('tempfile').hash(), digest)
+        self.assertEqual(len(calls), 1)
+
+        self.write('modified')
+        self.assertNotEqual(self.ds.hash(), digest)
+        self.assertEqual(len(calls), 2)
+
+    def test_clear_removes_cache(self):
+        self.write('data')
+        self.ds.hash()
+        self.ds.clear()
+        assert not os.path.exists(self.ds.get_hashcachepath())
+
+    def test_standalone_file_caches_in_memory(self):
+        ds = DataFile(os.path.join(self.tempdir, 'standalone'))
+        with ds.open('w') as f:
+            f.write('data')
+        calls = self.count_filedigest()
+        digest = ds.hash()
+        self.assertEqual(ds.hash(), digest)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(ds.get_hashcachepath(), None)
+        self.assertEqual(os.listdir(self.tempdir), ['standalone'])
+
+
+class TestDataFileMMap(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.ds = DataFile(os.path.join(self.tempdir, 'tempfile'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def write(self, data):
+        with self.ds.open('wb') as f:
+            f.write(data)
+
+    def test_mmap(self):
+        self.write(b'some data')
+        for m in [self.ds.mmap(), self.ds.open(mmap=True),
+                  self.ds.open('rb', mmap=True)]:
+            self.assertEqual(len(m), 9)
+            self.assertEqual(m[:], b'some data')
+            self.assertEqual(m.find(b'data'), 5)
+            m.close()
+
+    def test_mmap_is_readonly(self):
+        self.write(b'some data')
+        m = self.ds.mmap()
+        self.assertRaises(TypeError, m.__setitem__, 0, b'S')
+        m.close()
+        for mode in ['w', 'ab', 'r+b']:
+            self.assertRaises(ValueError, self.ds.open, mode, mmap=True)
+
+    def test_mmap_empty_file(self):
+        self.write(b'')
+        self.assertEqual(self.ds.mmap(), b'')
+
+
+class TestDataDirectory(MixInNestableTestCase, MixInReopenTestCase,
                         unittest.TestCase):
     dstype = DataDirectory
 
@@ -20,3 +138,165 @@ class TestDataDirectoryWithMagic(MixInNestableAutoValueTestCase,
                                  MixInWithTempDirectory,
                                  unittest.TestCase):
     dstype = DataDirectoryWithMagic
+
+    def test_set_loaded_value(self):
+        self.ds['a'] = dict(array=numpy.arange(1000.0))
+        value = self.ds['a']
+        value['array'][0] = 5
+        self.ds['a'] = value
+        self.assertEqual(self.ds['a']['array'][0], 5)
+        self.assertEqual(value['array'][1], 1)
+        self.assertEqual(list(self.dstype(self.tempdir)), ['a'])
+
+    def test_set_value_on_unknown_directory(self):
+        path = self.ds.aspath('key')
+        os.makedirs(path)
+        ds = self.dstype(self.tempdir)
+        try:
+            ds['key'] = 1
+        except KeyError as err:
+            assert 'unknown directory exists already' in str(err)
+        else:
+            self.fail('KeyError is not raised')
+        assert os.path.isdir(path)
+
+
+class RegistryDirectory(DataDirectoryWithMagic):
+    valuestore_types = dict(VALUESTORE_TYPES)
+    valuestore_types[tuple] = DataValueYAML
+
+
+class TestRegistryDirectory(TestDataDirectoryWithMagic):
+
+    dstype = RegistryDirectory
+
+    def assert_valuestore_type(self, ds, key, dstype):
+        self.assertEqual(type(ds._get_store(key)), dstype)
+
+    def test_valuestore_types(self):
+        ds = self.ds
+        ds['bytes'] = b'raw'
+        ds['array'] = numpy.arange(3)
+        ds['tuple'] = (1, 2)
+        ds['dict'] = {'a': 1}
+        for ds in [ds, self.dstype(self.tempdir)]:
+            self.assert_valuestore_type(ds, 'bytes', DataValueBytes)
+            self.assert_valuestore_type(ds, 'array', DataValueNumpy)
+            self.assert_valuestore_type(ds, 'tuple', DataValueYAML)
+            self.assert_valuestore_type(ds, 'dict', DataValuePickle)
+            self.assertEqual(ds['bytes'], b'raw')
+            numpy.testing.assert_equal(ds['array'], numpy.arange(3))
+            self.assertEqual(ds['tuple'], (1, 2))
+            self.assertEqual(ds['dict'], {'a': 1})
+
+    def test_change_value_type(self):
+        self.ds['key'] = numpy.arange(3)
+        self.ds['key'] = {'a': 1}
+        self.assert_valuestore_type(self.ds, 'key', DataValuePickle)
+        reds = self.dstype(self.tempdir)
+        self.assertEqual(reds['key'], {'a': 1})
+        reds['key'] = b'raw'
+        self.assertEqual(self.dstype(self.tempdir)['key'], b'raw')
+
+
+class ShardedDataDirectory(DataDirectory):
+    shardlevels = 2
+
+
+class ShardedDataDirectoryWithMagic(DataDirectoryWithMagic):
+    shardlevels = 1
+
+
+class TestShardedDataDirectory(TestDataDirectory):
+    dstype = ShardedDataDirectory
+
+    def test_sharded_layout(self):
+        sub = self.ds.get_substore('sub')
+        with self.ds.get_filestore('file').open('w') as f:
+            f.write('data')
+        for (key, store) in [('sub', sub), ('file', self.ds['file'])]:
+            relpath = os.path.relpath(store.path, self.ds.path)
+            parts = relpath.split(os.path.sep)
+            self.assertEqual(len(parts), 3)
+            self.assertEqual(parts[-1], key)
+            self.assertTrue(all(len(p) == 2 for p in parts[:-1]))
+        # Substore inherits the layout
+        self.assertEqual(sub.shardlevels, 2)
+        self.assertEqual(sorted(self.ds), ['file', 'sub'])
+
+
+class TestShardedDataDirectoryWithMagic(TestDataDirectoryWithMagic):
+    dstype = ShardedDataDirectoryWithMagic
+
+
+class HashCountingDataFile(DataFile):
+
+    hashed = []
+
+    def hash(self):
+        if not self.exists():
+            return None
+        self.hashed.append(os.path.basename(self.path))
+        with self.open() as f:
+            return hexdigest([f.read()])
+
+
+class HashCountingDataDirectory(DataDirectory):
+    default_streamstore_type = HashCountingDataFile
+
+
+class TestMerkleHash(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.ds = HashCountingDataDirectory(self.tempdir)
+        HashCountingDataFile.hashed = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def write(self, store, data):
+        with store.open('w') as f:
+            f.write(data)
+
+    def test_only_modified_branch_is_hashed(self):
+        sub = self.ds.get_substore('sub')
+        self.write(sub.get_filestore('a'), 'a')
+        self.write(sub.get_filestore('b'), 'b')
+        self.write(self.ds.get_filestore('c'), 'c')
+        self.assertEqual(self.ds.stamp(), self.ds.stamp())
+
+        first = self.ds.hash()
+        assert first is not None
+        self.assertEqual(sorted(HashCountingDataFile.hashed), ['a', 'b', 'c'])
+
+        HashCountingDataFile.hashed = []
+        self.assertEqual(self.ds.hash(), first)
+        self.assertEqual(HashCountingDataFile.hashed, [])
+
+        self.write(sub.get_filestore('a'), 'modified')
+        second = self.ds.hash()
+        self.assertNotEqual(second, first)
+        self.assertEqual(HashCountingDataFile.hashed, ['a'])
+
+        HashCountingDataFile.hashed = []
+        self.write(self.ds.get_filestore('d'), 'd')
+        self.assertNotEqual(self.ds.hash(), second)
+        self.assertEqual(HashCountingDataFile.hashed, ['d'])
+
+    def test_change_by_another_instance(self):
+        self.write(self.ds.get_filestore('a'), 'a')
+        first = self.ds.hash()
+        other = HashCountingDataDirectory(self.tempdir)
+        self.write(other.get_filestore('b'), 'b')
+        second = self.ds.hash()
+        self.assertNotEqual(second, first)
+        self.assertEqual(second, other.hash())
+        del other['b']
+        self.assertEqual(self.ds.hash(), first)
+
+    def test_unhashable_leaf(self):
+        self.ds.get_substore('sub').get_filestore('a')
+        # Not yet written file has no stamp:
+        self.assertEqual(self.ds.stamp(), None)
+        self.assertEqual(self.ds.hash(), None)
@@ -1,8 +1,11 @@
 import os
+import operator
+import itertools
 import collections
 from contextlib import contextmanager
 
 from ..utils import mkdirp
+from ..utils.hashutils import canonical_encode, stablehash
 
 
 class BaseKVStore(collections.MutableMapping):
@@ -14,13 +17,50 @@ class BaseKVStore(collections.MutableMapping):
     :class:`buildlet.datastore.autodirectory.DataAutoDirectory`.
     It is used for storing key-to-path map.
 
+    Keys need not to be hashable.  They are indexed by their canonical
+    encoding (see :func:`buildlet.utils.hashutils.canonical_encode`),
+    so lookup takes constant time.  Keys which can't be encoded must
+    be hashable.  As the encoding distinguishes types, keys such as
+    ``1``, ``1.0`` and ``True`` are different keys.  However, ASCII
+    `str` and `unicode` are the same key in Python 2, as they are
+    equal.
+
+    Changes are written to the file only by :meth:`autosync`.
+    When :attr:`journal` is true, changes are appended to a journal
+    file (:meth:`get_journalpath`) instead of rewriting the whole
+    file.  The journal is merged into the main file by
+    :meth:`compact` when it gets longer than the number of keys (or
+    :attr:`compact_threshold`), or when it ends with a broken record
+    (e.g., the writer was killed) so that no record is appended
+    after the broken one.
+
     """
 
     mode = 't'
 
-    def __init__(self, path):
+    journal = False
+    """
+    Record changes in an append-only journal file.
+    """
+
+    compact_threshold = 1000
+    """
+    Minimum number of journal records to trigger :meth:`compact`.
+    """
+
+    def __init__(self, path, journal=None):
         self.path = path
-        self._db = []
+        if journal is not None:
+            self.journal = journal
+        # Map from index key to ``(order, key, value)``.  `order` is
+        # taken from `self._counter` to keep the insertion order.
+        self._index = {}
+        self._counter = itertools.count()
+        self._records = []
+        self._journal_length = 0
+        self._journal_broken = False
+        self._signature = None
+        self._syncdepth = 0
         self._mkdirp()
 
     def _mkdirp(self):
@@ -32,6 +72,44 @@ class BaseKVStore(collections.MutableMapping):
     def dump(self, fp):
         raise NotImplementedError
 
+    def load_records(self, fp):
+        """
+        Yield records written by :meth:`dump_record`.
+
+        A record is a sequence ``('set', key, value)`` or
+        ``('del', key)``.  `fp` is opened in binary mode and its
+        position must be at the end of the last yielded record.
+        Loading must stop at a broken record (e.g., due to
+        interrupted write) without raising an error.
+
+        """
+        raise NotImplementedError
+
+    def dump_record(self, fp, record):
+        """
+        Write a `record` to the journal file `fp`.
+        """
+        raise NotImplementedError
+
+    def get_journalpath(self):
+        return self.path + '.journal'
+
+    @property
+    def _db(self):
+        """
+        List of ``(key, value)`` pairs.  This is what is serialized.
+        """
+        return [(k, v) for (_, k, v) in self._ordered()]
+
+    @_db.setter
+    def _db(self, pairs):
+        self._index = {}
+        for (k, v) in pairs:
+            self._index[self.index_key(k)] = (next(self._counter), k, v)
+
+    def _ordered(self):
+        return sorted(self._index.values(), key=operator.itemgetter(0))
+
     @staticmethod
     def filter_key(key):
         """
@@ -39,41 +117,182 @@ class BaseKVStore(collections.MutableMapping):
         """
         return key
 
+    @staticmethod
+    def index_key(key):
+        """
+        Return a hashable object to index (filtered) `key`.
+        """
+        try:
+            return canonical_encode(_text_as_unicode(key))
+        except TypeError:
+            return key
+
+    def digest_key(self, key):
+        """
+        Return a hex digest of `key`, stable across processes.
+
+        Keys which are the same for :meth:`index_key` have the same
+        digest.  `key` must be encodable by
+        :func:`buildlet.utils.hashutils.canonical_encode`.
+
+        """
+        return stablehash(_text_as_unicode(self.filter_key(key)))
+
     def __getitem__(self, key):
         key = self.filter_key(key)
-        for (k, v) in self._db:
-            if k == key:
-                return v
-        raise KeyError(key)
+        try:
+            return self._index[self.index_key(key)][2]
+        except KeyError:
+            raise KeyError(key)
 
     def __setitem__(self, key, value):
-        del self[key]
         key = self.filter_key(key)
-        self._db.append((key, value))
+        # Overwritten key goes to the last as before.
+        self._index[self.index_key(key)] = (next(self._counter), key, value)
+        self._records.append(('set', key, value))
 
     def __delitem__(self, key):
         key = self.filter_key(key)
-        self._db = [(k, v) for (k, v) in self._db if not k == key]
+        if self._index.pop(self.index_key(key), None) is not None:
+            self._records.append(('del', key))
+
+    def clear(self):
+        """
+        Remove all keys and the files storing them.
+        """
+        self._index.clear()
+        self._records = []
+        self._journal_length = 0
+        self._journal_broken = False
+        self._signature = None
+        for path in [self.path, self.get_journalpath()]:
+            if os.path.exists(path):
+                os.remove(path)
 
     def values(self):
-        return [v for (k, v) in self._db]
+        return [v for (_, _, v) in self._ordered()]
 
     def __len__(self):
-        return len(self._db)
+        return len(self._index)
 
     def __iter__(self):
-        for (k, v) in self._db:
+        for (_, k, _) in self._ordered():
             yield k
 
     @contextmanager
     def autosync(self):
         """
         Context manger to automatically load/dump any change.
+
+        The file is loaded only when it is changed since the last
+        load or dump, and it is written only when this store is
+        changed.
+
+        It can be nested.  Only the outermost one loads and dumps,
+        so that many changes can be batched in one sync.
+
         """
-        self._mkdirp()
-        if os.path.exists(self.path):
+        outermost = not self._syncdepth
+        if outermost:
+            self._mkdirp()
+            self._sync_load()
+        self._syncdepth += 1
+        try:
+            yield
+        finally:
+            self._syncdepth -= 1
+        if outermost:
+            self._sync_dump()
+
+    def _stat_signature(self):
+        signature = []
+        for path in [self.path, self.get_journalpath()]:
+            try:
+                st = os.stat(path)
+            except OSError:
+                signature.append(None)
+            else:
+                signature.append((st.st_ino, st.st_size,
+                                  getattr(st, 'st_mtime_ns', st.st_mtime)))
+        return tuple(signature)
+
+    def _sync_load(self):
+        signature = self._stat_signature()
+        if signature == self._signature or signature == (None, None):
+            return
+        if signature[0] is not None:
             with open(self.path, 'r' + self.mode) as fp:
                 self.load(fp)
-        yield
-        with open(self.path, 'w' + self.mode) as fp:
+        else:
+            self._db = []
+        self._journal_length = 0
+        self._journal_broken = False
+        if signature[1] is not None:
+            with open(self.get_journalpath(), 'rb') as fp:
+                end = 0
+                for record in self.load_records(fp):
+                    self._replay(record)
+                    self._journal_length += 1
+                    end = fp.tell()
+                self._journal_broken = end < os.fstat(fp.fileno()).st_size
+        self._records = []
+        self._signature = signature
+
+    def _replay(self, record):
+        (op, key) = record[:2]
+        ikey = self.index_key(key)
+        if op == 'set':
+            self._index[ikey] = (next(self._counter), key, record[2])
+        else:
+            self._index.pop(ikey, None)
+
+    def _sync_dump(self):
+        if not self._records:
+            return
+        num = self._journal_length + len(self._records)
+        if self.journal and not self._journal_broken and \
+           num <= max(self.compact_threshold, len(self)):
+            with open(self.get_journalpath(), 'a' + self.mode) as fp:
+                for record in self._records:
+                    self.dump_record(fp, record)
+            self._journal_length = num
+            self._records = []
+            self._signature = self._stat_signature()
+        else:
+            self.compact()
+
+    def compact(self):
+        """
+        Write all keys and values to the main file and remove journal.
+        """
+        temppath = self.path + '.tmp'
+        with open(temppath, 'w' + self.mode) as fp:
             self.dump(fp)
+        os.rename(temppath, self.path)
+        if os.path.exists(self.get_journalpath()):
+            os.remove(self.get_journalpath())
+        self._journal_length = 0
+        self._journal_broken = False
+        self._records = []
+        self._signature = self._stat_signature()
+
+
+def _text_as_unicode(obj):
+    """
+    Convert ASCII `str` in `obj` to `unicode` (Python 2 only).
+    """
+    if isinstance(obj, bytes) and bytes is str:
+        try:
+            return obj.decode('ascii')
+        except UnicodeDecodeError:
+            return obj
+    elif isinstance(obj, tuple):
+        return tuple(map(_text_as_unicode, obj))
+    elif isinstance(obj, list):
+        return list(map(_text_as_unicode, obj))
+    elif isinstance(obj, dict):
+        return dict((_text_as_unicode(k), _text_as_unicode(v))
+                    for (k, v) in obj.items())
+    elif isinstance(obj, (set, frozenset)):
+        return frozenset(map(_text_as_unicode, obj))
+    return obj
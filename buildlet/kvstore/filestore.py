@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from ..utils import _pickle as pickle
+from ..utils import mkdirp
+
+from .base import BaseKVStore
+
+
+class KVStoreFiles(BaseKVStore):
+
+    """
+    Key-value store keeping each item in its own file.
+
+    >>> import os
+    >>> from buildlet.utils.tempdir import TemporaryDirectory
+    >>> with TemporaryDirectory() as tempdir:
+    ...     kvs = KVStoreFiles(os.path.join(tempdir, 'kvstore'))
+    ...     with kvs.autosync():
+    ...         kvs[{'key': 'can be dictionary'}] = 'value'
+    ...     with kvs.autosync():
+    ...         print(kvs[{'key': 'can be dictionary'}])
+    value
+
+    `path` is a directory.  An item is pickled into a file whose
+    name is :meth:`digest_key <.base.BaseKVStore.digest_key>` of its
+    key.  Therefore, keys must be encodable by
+    :func:`buildlet.utils.hashutils.canonical_encode`.
+
+    There is no shared file.  Each change is written immediately and
+    atomically (by renaming a temporary file), so that processes can
+    set different keys without any coordination.  :meth:`autosync`
+    does nothing.  Iteration order is not the insertion order.  The
+    `journal` argument is ignored.
+
+    """
+
+    mode = 'b'
+
+    def __init__(self, path, journal=None):
+        super(KVStoreFiles, self).__init__(path)
+
+    def getfilepath(self, key):
+        return os.path.join(self.path, self.digest_key(key))
+
+    def _load_item(self, filepath):
+        with open(filepath, 'rb') as fp:
+            return pickle.load(fp)
+
+    def __getitem__(self, key):
+        try:
+            return self._load_item(self.getfilepath(key))[1]
+        except (IOError, OSError):
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        key = self.filter_key(key)
+        mkdirp(self.path)
+        (fd, temppath) = tempfile.mkstemp(dir=self.path, prefix='.tmp')
+        with os.fdopen(fd, 'wb') as fp:
+            pickle.dump((key, value), fp, 2)
+        os.rename(temppath, self.getfilepath(key))
+
+    def __delitem__(self, key):
+        filepath = self.getfilepath(key)
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+    def __contains__(self, key):
+        return os.path.exists(self.getfilepath(key))
+
+    def _iterfiles(self):
+        if not os.path.isdir(self.path):
+            return []
+        return [os.path.join(self.path, name)
+                for name in sorted(os.listdir(self.path))
+                if not name.startswith('.')]
+
+    @property
+    def _db(self):
+        return [self._load_item(p) for p in self._iterfiles()]
+
+    def values(self):
+        return [v for (k, v) in self._db]
+
+    def __len__(self):
+        return len(self._iterfiles())
+
+    def __iter__(self):
+        for (k, v) in self._db:
+            yield k
+
+    def clear(self):
+        if os.path.exists(self.path):
+            shutil.rmtree(self.path)
+
+    @contextmanager
+    def autosync(self):
+        yield
+
+    def compact(self):
+        pass
@@ -38,8 +38,24 @@ class KVStoreJSON(BaseKVStore):
     def dump(self, fp):
         json.dump(self._db, fp)
 
+    def load_records(self, fp):
+        # One record per line.  A line without newline or which can't
+        # be decoded is a partially written record.
+        while True:
+            line = fp.readline()
+            if not line.endswith(b'\n'):
+                return
+            try:
+                record = json.loads(line.decode('utf-8'))
+            except ValueError:
+                return
+            yield record
+
+    def dump_record(self, fp, record):
+        fp.write(json.dumps(record) + '\n')
+
     @staticmethod
-    def filtered_key(key):
+    def filter_key(key):
         # convert tuples to list, etc.
         # there should be lot better way to do this...
         return json.loads(json.dumps(key))
@@ -27,3 +27,17 @@ class KVStorePickle(BaseKVStore):
 
     def dump(self, fp):
         pickle.dump(self._db, fp)
+
+    def load_records(self, fp):
+        while True:
+            try:
+                record = pickle.load(fp)
+            except Exception:
+                # End of file or partially written record.  Unpickling
+                # truncated data can raise almost any error (e.g.,
+                # ValueError for protocol 0 in Python 2).
+                return
+            yield record
+
+    def dump_record(self, fp, record):
+        pickle.dump(record, fp)
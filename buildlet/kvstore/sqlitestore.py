@@ -0,0 +1,187 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from ..utils import _pickle as pickle
+
+from .base import BaseKVStore
+
+
+class KVStoreSQLite(BaseKVStore):
+
+    """
+    SQLite based key-value store.
+
+    >>> import os
+    >>> from buildlet.utils.tempdir import TemporaryDirectory
+    >>> with TemporaryDirectory() as tempdir:
+    ...     kvs = KVStoreSQLite(os.path.join(tempdir, 'kvstore'))
+    ...     with kvs.autosync():
+    ...         kvs[{'key': 'can be dictionary'}] = 'value'
+    ...     with kvs.autosync():
+    ...         print(kvs[{'key': 'can be dictionary'}])
+    value
+
+    Unlike other key-value stores, data is not loaded into memory.
+    Each operation is an indexed query on the database and a change
+    is written immediately.  The database is in WAL mode, so that it
+    can be read while another process is writing to it.
+    :meth:`autosync` runs its block in a single transaction started
+    by ``BEGIN IMMEDIATE``, i.e., processes sharing the database take
+    turns to run the block.  Keep the block short.
+
+    Keys must be encodable by
+    :func:`buildlet.utils.hashutils.canonical_encode`.  They are
+    indexed by :meth:`digest_key <.base.BaseKVStore.digest_key>`.  Keys and
+    values are stored as pickles.  The `journal` argument is ignored.
+
+    """
+
+    mode = 'b'
+    timeout = 60
+
+    def __init__(self, path, journal=None):
+        super(KVStoreSQLite, self).__init__(path)
+        self._setup()
+
+    def _setup(self):
+        self._connection = None
+        self._depth = 0
+        self._lock = threading.RLock()
+
+    def __getstate__(self):
+        # Connection and lock can't be pickled.
+        return dict(path=self.path)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._setup()
+
+    def connect(self):
+        """Return a (cached) connection to the database."""
+        if self._connection is None:
+            self._mkdirp()
+            # Transactions are started explicitly (see `autosync`).
+            conn = sqlite3.connect(self.path, timeout=self.timeout,
+                                   isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS kvstore ('
+                'digest TEXT PRIMARY KEY, key BLOB NOT NULL, '
+                'value BLOB NOT NULL)')
+            self._connection = conn
+        return self._connection
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def clear(self):
+        """
+        Remove the database files.
+        """
+        with self._lock:
+            self.close()
+            for suffix in ['', '-wal', '-shm']:
+                if os.path.exists(self.path + suffix):
+                    os.remove(self.path + suffix)
+
+    def _execute(self, sql, args=()):
+        with self._lock:
+            return self.connect().execute(sql, args).fetchall()
+
+    def _digest(self, key):
+        return self.digest_key(key)
+
+    @staticmethod
+    def _dumps(obj):
+        return sqlite3.Binary(pickle.dumps(obj, 2))
+
+    @staticmethod
+    def _loads(blob):
+        return pickle.loads(bytes(blob))
+
+    @property
+    def _db(self):
+        return [(self._loads(k), self._loads(v)) for (k, v) in self._execute(
+            'SELECT key, value FROM kvstore ORDER BY rowid')]
+
+    def __getitem__(self, key):
+        rows = self._execute('SELECT value FROM kvstore WHERE digest = ?',
+                             (self._digest(key),))
+        if not rows:
+            raise KeyError(key)
+        return self._loads(rows[0][0])
+
+    def __setitem__(self, key, value):
+        key = self.filter_key(key)
+        # Overwritten key goes to the last as other stores.
+        self._execute(
+            'INSERT OR REPLACE INTO kvstore (digest, key, value) '
+            'VALUES (?, ?, ?)',
+            (self._digest(key), self._dumps(key), self._dumps(value)))
+
+    def setdefault(self, key, default=None):
+        """
+        Set `key` to `default` if not set and return the value of `key`.
+
+        The check and the set are done atomically in one statement.
+
+        """
+        key = self.filter_key(key)
+        with self.autosync():
+            self._execute(
+                'INSERT OR IGNORE INTO kvstore (digest, key, value) '
+                'VALUES (?, ?, ?)',
+                (self._digest(key), self._dumps(key), self._dumps(default)))
+            return self[key]
+
+    def __delitem__(self, key):
+        self._execute('DELETE FROM kvstore WHERE digest = ?',
+                      (self._digest(key),))
+
+    def __contains__(self, key):
+        return bool(self._execute(
+            'SELECT 1 FROM kvstore WHERE digest = ?', (self._digest(key),)))
+
+    def values(self):
+        return [self._loads(v) for (v,) in self._execute(
+            'SELECT value FROM kvstore ORDER BY rowid')]
+
+    def __len__(self):
+        return self._execute('SELECT COUNT(*) FROM kvstore')[0][0]
+
+    def __iter__(self):
+        for (k,) in self._execute('SELECT key FROM kvstore ORDER BY rowid'):
+            yield self._loads(k)
+
+    @contextmanager
+    def autosync(self):
+        """
+        Context manger to run the block in one transaction.
+
+        It can be nested.  Only the outermost one starts and commits
+        the transaction.
+
+        """
+        with self._lock:
+            if self._depth == 0:
+                self._execute('BEGIN IMMEDIATE')
+            self._depth += 1
+            try:
+                yield
+            except:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._execute('ROLLBACK')
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self._execute('COMMIT')
+
+    def compact(self):
+        self._execute('VACUUM')
@@ -0,0 +1,263 @@
+import os
+import tempfile
+import shutil
+import unittest
+import multiprocessing
+
+from ...utils import _pickle as pickle
+from ..picklestore import KVStorePickle
+from ..jsonstore import KVStoreJSON
+from ..sqlitestore import KVStoreSQLite
+from ..filestore import KVStoreFiles
+
+
+class MixInKVStoreTestCase(object):
+
+    KVStoreClass = None
+    ordered = True
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.kvs = self.make_kvstore()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def make_kvstore(self):
+        return self.KVStoreClass(os.path.join(self.tempdir, 'kvstore'))
+
+    def test_complex_keys(self):
+        keys = [('a', 1), {'b': [1, 2]}, [{'c': None}], 'd', 1]
+        with self.kvs.autosync():
+            for (i, k) in enumerate(keys):
+                self.kvs[k] = i
+        kvs = self.make_kvstore()
+        with kvs.autosync():
+            for (i, k) in enumerate(keys):
+                self.assertEqual(kvs[k], i)
+            self.assertEqual(len(kvs), len(keys))
+
+    def test_nested_autosync(self):
+        with self.kvs.autosync():
+            with self.kvs.autosync():
+                self.kvs['a'] = 1
+            with self.kvs.autosync():
+                self.kvs['b'] = 2
+        kvs = self.make_kvstore()
+        with kvs.autosync():
+            self.assertEqual(sorted(kvs.items()), [('a', 1), ('b', 2)])
+
+    def test_dict_key_order(self):
+        with self.kvs.autosync():
+            self.kvs[{'a': 1, 'b': 2, 'c': 3}] = 'value'
+        kvs = self.make_kvstore()
+        with kvs.autosync():
+            self.assertEqual(kvs[{'c': 3, 'b': 2, 'a': 1}], 'value')
+
+    def test_str_and_unicode_keys(self):
+        with self.kvs.autosync():
+            self.kvs['a'] = 1
+            self.kvs[('b', {'c': ['d']})] = 2
+            self.assertEqual(self.kvs[u'a'], 1)
+        kvs = self.make_kvstore()
+        with kvs.autosync():
+            self.assertEqual(kvs.get(u'a'), 1)
+            self.assertEqual(kvs[(u'b', {u'c': [u'd']})], 2)
+            kvs[u'a'] = 3
+            self.assertEqual(len(kvs), 2)
+
+    def test_overwrite_and_delete(self):
+        with self.kvs.autosync():
+            self.kvs['a'] = 1
+            self.kvs['b'] = 2
+            self.kvs['a'] = 3
+            if self.ordered:
+                self.assertEqual(list(self.kvs), ['b', 'a'])
+                self.assertEqual(self.kvs.values(), [2, 3])
+            del self.kvs['b']
+            self.assertRaises(KeyError, self.kvs.__getitem__, 'b')
+        kvs = self.make_kvstore()
+        with kvs.autosync():
+            self.assertEqual(dict(kvs.items()), {'a': 3})
+
+    def test_many_keys(self):
+        num = 10000
+        with self.kvs.autosync():
+            for i in range(num):
+                self.kvs[('key', i)] = i
+        kvs = self.make_kvstore()
+        with kvs.autosync():
+            self.assertEqual(sum(kvs[('key', i)] for i in range(num)),
+                             sum(range(num)))
+
+
+class TestKVStorePickle(MixInKVStoreTestCase, unittest.TestCase):
+    KVStoreClass = KVStorePickle
+
+
+class TestKVStoreJSON(MixInKVStoreTestCase, unittest.TestCase):
+    KVStoreClass = KVStoreJSON
+
+    def test_tuple_is_list(self):
+        with self.kvs.autosync():
+            self.kvs[(0, 1)] = 'value'
+            self.assertEqual(self.kvs[[0, 1]], 'value')
+
+
+class MixInJournalTestCase(MixInKVStoreTestCase):
+
+    def make_kvstore(self):
+        kvs = self.KVStoreClass(os.path.join(self.tempdir, 'kvstore'),
+                                journal=True)
+        kvs.compact_threshold = 10
+        return kvs
+
+    def test_no_write_on_read(self):
+        with self.kvs.autosync():
+            self.kvs['a'] = 1
+        mtime = os.path.getmtime(self.kvs.get_journalpath())
+        os.utime(self.kvs.get_journalpath(), (0, 0))
+        with self.kvs.autosync():
+            self.kvs['a']
+        self.assertEqual(os.path.getmtime(self.kvs.get_journalpath()), 0)
+        assert mtime != 0
+
+    def test_journal_and_compaction(self):
+        for i in range(5):
+            with self.kvs.autosync():
+                self.kvs['a'] = i
+        # Changes are only in the journal
+        self.assertFalse(os.path.exists(self.kvs.path))
+        self.assertTrue(os.path.exists(self.kvs.get_journalpath()))
+        for i in range(10):
+            with self.kvs.autosync():
+                self.kvs['b'] = i
+        # Journal is compacted
+        self.assertTrue(os.path.exists(self.kvs.path))
+        kvs = self.make_kvstore()
+        with kvs.autosync():
+            self.assertEqual(dict(kvs.items()), {'a': 4, 'b': 9})
+
+    def test_reload_change_by_another_instance(self):
+        with self.kvs.autosync():
+            self.kvs['a'] = 1
+        other = self.make_kvstore()
+        with other.autosync():
+            other['a'] = 2
+            del other['a']
+            other['b'] = 3
+        with self.kvs.autosync():
+            self.assertEqual(dict(self.kvs.items()), {'b': 3})
+
+    def test_broken_last_record(self):
+        with self.kvs.autosync():
+            self.kvs['a'] = 1
+        with self.kvs.autosync():
+            self.kvs['b'] = 2
+        path = self.kvs.get_journalpath()
+        with open(path, 'rb') as f:
+            data = f.read()
+        with open(path, 'wb') as f:
+            f.write(data[:-2])
+        kvs = self.make_kvstore()
+        with kvs.autosync():
+            self.assertEqual(dict(kvs.items()), {'a': 1})
+
+    def test_append_after_broken_record(self):
+        path = self.kvs.get_journalpath()
+        with self.kvs.autosync():
+            self.kvs['a'] = 1
+        start = os.path.getsize(path)
+        with self.kvs.autosync():
+            self.kvs['b'] = 2
+        with open(path, 'rb') as f:
+            data = f.read()
+        for end in range(start, len(data)):
+            self.kvs.clear()
+            with open(path, 'wb') as f:
+                f.write(data[:end])
+            other = self.make_kvstore()
+            with other.autosync():
+                other['c'] = 3
+            kvs = self.make_kvstore()
+            with kvs.autosync():
+                self.assertEqual(dict(kvs.items()), {'a': 1, 'c': 3})
+            with kvs.autosync():
+                kvs['d'] = 4
+            with other.autosync():
+                self.assertEqual(dict(other.items()),
+                                 {'a': 1, 'c': 3, 'd': 4})
+
+
+class TestKVStorePickleJournal(MixInJournalTestCase, unittest.TestCase):
+    KVStoreClass = KVStorePickle
+
+
+class TestKVStoreJSONJournal(MixInJournalTestCase, unittest.TestCase):
+    KVStoreClass = KVStoreJSON
+
+
+class TestKVStoreSQLite(MixInKVStoreTestCase, unittest.TestCase):
+    KVStoreClass = KVStoreSQLite
+
+    def test_changes_are_visible_immediately(self):
+        other = self.make_kvstore()
+        self.kvs['a'] = 1
+        self.assertEqual(other['a'], 1)
+        with self.kvs.autosync():
+            self.kvs['b'] = 2
+            with self.kvs.autosync():
+                self.kvs['c'] = 3
+        self.assertEqual(sorted(other), ['a', 'b', 'c'])
+
+    def test_rollback(self):
+        try:
+            with self.kvs.autosync():
+                self.kvs['a'] = 1
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(len(self.kvs), 0)
+
+    def test_setdefault(self):
+        self.assertEqual(self.kvs.setdefault('a', 1), 1)
+        self.assertEqual(self.kvs.setdefault('a', 2), 1)
+        self.assertEqual(self.kvs['a'], 1)
+
+    def test_pickle(self):
+        self.kvs['a'] = 1
+        kvs = pickle.loads(pickle.dumps(self.kvs))
+        self.assertEqual(kvs['a'], 1)
+
+    def test_concurrent_processes(self):
+        num = 4
+        pool = multiprocessing.Pool(num)
+        try:
+            pool.map(add_keys, [(self.kvs, i) for i in range(num)])
+        finally:
+            pool.close()
+            pool.join()
+        self.assertEqual(len(self.kvs), num * 50)
+        self.assertEqual(sorted(self.kvs.values()), list(range(num * 50)))
+
+
+def add_keys(args):
+    (kvs, i) = args
+    for j in range(50):
+        with kvs.autosync():
+            # Check-then-set must be atomic
+            value = len(kvs)
+            kvs[(i, j)] = value
+
+
+class TestKVStoreFiles(MixInKVStoreTestCase, unittest.TestCase):
+    KVStoreClass = KVStoreFiles
+    ordered = False
+
+    def test_changes_are_visible_immediately(self):
+        other = self.make_kvstore()
+        self.kvs['a'] = 1
+        self.assertEqual(other['a'], 1)
+        self.assertTrue('a' in other)
+        del self.kvs['a']
+        self.assertFalse('a' in other)
@@ -4,8 +4,10 @@ Utility functions to execute tasks.
 
 _namemodmap = dict(
     SimpleRunner='simple',
+    AsyncioRunner='asyncioloop',
     IPythonParallelRunner='ipythonparallel',
     MultiprocessingRunner='multiprocessingpool',
+    ThreadPoolRunner='threadpool',
 )
 
 
@@ -29,8 +31,9 @@ def listrunner():
 
     Currently defined runners:
 
-    >>> sorted(listrunner())
-    ['IPythonParallelRunner', 'MultiprocessingRunner', 'SimpleRunner']
+    >>> sorted(listrunner())                 # doctest: +NORMALIZE_WHITESPACE
+    ['AsyncioRunner', 'IPythonParallelRunner', 'MultiprocessingRunner',
+     'SimpleRunner', 'ThreadPoolRunner']
 
     """
     return list(_namemodmap)
@@ -0,0 +1,182 @@
+import collections
+import functools
+
+try:
+    import asyncio
+except ImportError:
+    # Python < 3.4.  Error is raised when the runner is initialized.
+    asyncio = None
+
+from ..task.base import BaseTask
+from .baseparallel import BaseParallelRunner
+
+
+class AsyncioRunner(BaseParallelRunner):
+
+    """
+    Task runner class driving tasks on an :mod:`asyncio` event loop.
+
+    Methods of tasks (:meth:`run <buildlet.task.base.BaseTask.run>`,
+    :meth:`load <buildlet.task.base.BaseTask.load>`, etc.) can be
+    native coroutine functions (``async def``).  Such methods are run
+    on the event loop.  Other (synchronous) methods are run in
+    `executor` using :meth:`asyncio.AbstractEventLoop.run_in_executor`.
+    Methods not overridden from :class:`BaseTask
+    <buildlet.task.base.BaseTask>` are simply called, as they do
+    nothing.
+
+    At most `max_concurrency` tasks are run at the same time.
+    As tasks are run in the same process, parent tasks are not
+    reloaded from data store before running its child.
+
+    This runner requires Python 3.4 or later.
+
+    """
+
+    def __init__(self, max_concurrency=100, executor=None):
+        if asyncio is None:
+            raise ImportError(
+                "{0} requires asyncio (Python 3.4 or later)."
+                .format(self.__class__.__name__))
+        self.max_concurrency = max_concurrency
+        self.executor = executor
+
+    def is_finished(self, task):
+        # Coroutine can't be run before the event loop starts.
+        # Do not prune such task.
+        if asyncio.iscoroutinefunction(task.is_finished):
+            return False
+        return task.is_finished()
+
+    def submit_tasks(self):
+        self.loop = asyncio.new_event_loop()
+        self.all_done = self.loop.create_future()
+        self.error = None
+        self.num_running = 0
+        self.num_done = 0
+        self.done_task_ids = set()
+        self.ready = collections.deque(self.init_pending_parents())
+        self.loop.call_soon(self.submit_ready_tasks)
+
+    def wait_tasks(self):
+        try:
+            self.loop.run_until_complete(self.all_done)
+        finally:
+            self.loop.close()
+
+    def submit_ready_tasks(self):
+        while self.ready and self.error is None and \
+                self.num_running < self.max_concurrency:
+            self.submit_node(self.ready.popleft())
+
+    def submit_node(self, node):
+        task = self.nodetaskmap[node]
+        # Parent task instance is not run nor loaded in this process
+        # when it is finished (and not needed until now) or collapsed
+        # into another instance by `get_task_key`.  Such task must be
+        # loaded.
+        parents_to_load = [p for p in task.get_parents()
+                           if id(p) not in self.done_task_ids]
+        future = self.spawn(
+            self.run_task(task, parents_to_load, load=(node == self.root)))
+        future.add_done_callback(functools.partial(self.node_done, node))
+        self.num_running += 1
+
+    def node_done(self, node, future):
+        self.num_running -= 1
+        self.num_done += 1
+        error = future.exception()
+        if error is not None:
+            if self.error is None:
+                self.error = error
+        else:
+            self.ready.extend(self.mark_done(node))
+
+        if self.error is not None:
+            # Wait for the running tasks, but do not start new ones.
+            if self.num_running == 0:
+                self.all_done.set_exception(self.error)
+        elif self.num_done == len(self.graph):
+            self.all_done.set_result(None)
+        else:
+            self.submit_ready_tasks()
+
+    def run_task(self, task, parents_to_load=(), load=True):
+        """
+        Generator version of :func:`.base.run_task`.
+
+        This generator yields futures and must be driven by
+        :meth:`spawn`.
+
+        """
+        yield self.call(task.pre_run)
+        try:
+            finished = yield self.call(task.is_finished)
+            if finished:
+                if load:
+                    yield self.call(task.load)
+            else:
+                for parent in parents_to_load:
+                    yield self.call(parent.load)
+                yield self.call(task.run)
+            yield self.call(task.post_success_run)
+        except Exception as e:
+            yield self.call(task.post_error_run, e)
+            raise
+        if load or not finished:
+            self.done_task_ids.add(id(task))
+
+    def call(self, method, *args):
+        """
+        Call `method` and return a future of its returned value.
+        """
+        if asyncio.iscoroutinefunction(method):
+            return asyncio.ensure_future(method(*args), loop=self.loop)
+        if is_base_method(method):
+            future = self.loop.create_future()
+            future.set_result(method(*args))
+            return future
+        return self.loop.run_in_executor(
+            self.executor, functools.partial(method, *args))
+
+    def spawn(self, generator):
+        """
+        Drive `generator` yielding futures and return a future of it.
+
+        The value (or the exception) of the yielded future is sent
+        back to `generator` when it is done.
+
+        """
+        outer = self.loop.create_future()
+
+        def step(value=None, error=None):
+            try:
+                if error is None:
+                    future = generator.send(value)
+                else:
+                    future = generator.throw(error)
+            except StopIteration:
+                outer.set_result(None)
+            except Exception as e:
+                outer.set_exception(e)
+            else:
+                future.add_done_callback(resume)
+
+        def resume(future):
+            error = future.exception()
+            if error is None:
+                step(future.result())
+            else:
+                step(error=error)
+
+        step()
+        return outer
+
+
+def is_base_method(method):
+    """
+    Return True if `method` is a bound method not overridden from BaseTask.
+    """
+    func = getattr(method, '__func__', None)
+    return func is not None and \
+        func is BaseTask.__dict__.get(getattr(method, '__name__', None))
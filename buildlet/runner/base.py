@@ -1,3 +1,6 @@
+import os
+
+
 class BaseRunner(object):
 
     """
@@ -10,3 +13,47 @@ class BaseRunner(object):
 
     def run(self, task):
         raise NotImplementedError
+
+    @staticmethod
+    def get_task_key(task):
+        """
+        Return a hashable object to identify `task` in a task graph.
+
+        Tasks stored in the same file-based data store are regarded
+        as the same task.  Otherwise, tasks are identified by their
+        identity.
+
+        """
+        path = getattr(getattr(task, 'datastore', None), 'path', None)
+        if path is not None:
+            return ('path', os.path.abspath(path))
+        return ('id', id(task))
+
+
+def run_task(task, parents_to_load=(), load=True):
+    """
+    Run or load `task`.
+
+    Parent tasks in `parents_to_load` are loaded before running
+    `task`.  Note that they are not loaded when `task` is finished.
+    When `load` is False, finished `task` is not loaded; its result
+    is not needed in this case (e.g., in a worker process).
+
+    Return False if `task` is neither run nor loaded.
+
+    """
+    task.pre_run()
+    try:
+        finished = task.is_finished()
+        if finished:
+            if load:
+                task.load()
+        else:
+            for parent in parents_to_load:
+                parent.load()
+            task.run()
+        task.post_success_run()
+    except Exception as e:
+        task.post_error_run(e)
+        raise
+    return load or not finished
@@ -2,35 +2,146 @@ import itertools
 
 import networkx as nx
 
-from .base import BaseRunner
+from .base import BaseRunner, run_task
 
 
 class BaseParallelRunner(BaseRunner):
 
     def run(self, task):
         self.create_graph(task)
+        self.prune_graph()
+        # Collapsed task instances are not updated when their
+        # canonical instances are run.
+        self.refresh_tasks(self.collapsed_tasks())
         self.submit_tasks()
         self.wait_tasks()
 
     def create_graph(self, task):
+        """
+        Create a DAG of tasks (:attr:`graph`) rooted at `task`.
+
+        Parent tasks sharing the same key (see :meth:`get_task_key`)
+        are collapsed into one node, so that a task shared by several
+        downstream tasks is submitted only once.  All task instances,
+        including the collapsed ones, are stored in :attr:`alltasks`
+        and refreshed (see :meth:`refresh_tasks`).
+
+        """
         self.graph = graph = nx.DiGraph()
         self.nodetaskmap = nodetaskmap = {}
+        self.alltasks = alltasks = []
+        keynodemap = {}
         counter = itertools.count().next
-        self.root = root = counter()
 
-        def creator(i, t):
+        def creator(t):
+            alltasks.append(t)
+            key = self.get_task_key(t)
+            if key in keynodemap:
+                return keynodemap[key]
+            i = keynodemap[key] = counter()
             nodetaskmap[i] = t
+            graph.add_node(i)
             for p in t.get_parents():
-                k = counter()
-                graph.add_node(k)
-                graph.add_edge(k, i)
-                creator(k, p)
+                graph.add_edge(creator(p), i)
+            return i
+
+        self.root = creator(task)
+        self.refresh_tasks()
+
+    def refresh_tasks(self, tasks=None):
+        """
+        Call :meth:`refresh <buildlet.task.base.BaseTask.refresh>`
+        of `tasks` (default: all tasks in :attr:`alltasks`).
+        """
+        for t in self.alltasks if tasks is None else tasks:
+            t.refresh()
+
+    def collapsed_tasks(self):
+        """
+        Return task instances in :attr:`alltasks` not in :attr:`graph`.
+
+        They are the duplicates collapsed into another instance by
+        :meth:`create_graph`.
+
+        """
+        canonical = set(id(t) for t in self.nodetaskmap.values())
+        return [t for t in self.alltasks if id(t) not in canonical]
+
+    def prune_graph(self):
+        """
+        Remove finished tasks from :attr:`graph` before submitting tasks.
+
+        A task is removed when it is finished and none of its ancestors
+        need to be run.  The root task is never removed.  Removed tasks
+        are not submitted to workers at all; they are loaded by their
+        child task only when it needs to run.  The removed nodes are
+        stored in :attr:`pruned_nodes`.
+
+        Finished tasks which are not removed (because some of its
+        ancestors are run) are not loaded in workers, except for the
+        root task.  See :meth:`get_run_args`.
+
+        """
+        graph = self.graph
+        stale = set()
+        pruned = []
+        for node in self.sorted_nodes():
+            if any(p in stale for p in graph.predecessors(node)) or \
+               not self.is_finished(self.nodetaskmap[node]):
+                stale.add(node)
+            elif node != self.root:
+                pruned.append(node)
+        graph.remove_nodes_from(pruned)
+        self.pruned_nodes = pruned
 
-        creator(root, task)
+    def get_run_args(self, node):
+        """
+        Return arguments for :attr:`run_func` to run `node`.
+        """
+        return [self.nodetaskmap[node], node == self.root]
+
+    def is_finished(self, task):
+        """
+        Call ``task.is_finished()`` in the current process.
+
+        This is used by :meth:`prune_graph`.  Child class can override
+        this method to skip pruning.
+
+        """
+        return task.is_finished()
 
     def sorted_nodes(self):
         return nx.topological_sort(self.graph)
 
+    def init_pending_parents(self):
+        """
+        Initialize :attr:`num_pending_parents` and return ready nodes.
+
+        :attr:`num_pending_parents` is a dict from node to the number
+        of its parents which are not finished yet.  Returned nodes
+        have no parent, i.e., they can be submitted right away.
+
+        """
+        self.num_pending_parents = dict(
+            (n, self.graph.in_degree(n)) for n in self.graph)
+        return [n for (n, num) in self.num_pending_parents.items()
+                if num == 0]
+
+    def mark_done(self, node):
+        """
+        Record that `node` is finished and return newly ready nodes.
+
+        Returned nodes are the children of `node` of which all parents
+        are finished now.
+
+        """
+        ready = []
+        for child in self.graph.successors(node):
+            self.num_pending_parents[child] -= 1
+            if self.num_pending_parents[child] == 0:
+                ready.append(child)
+        return ready
+
     def submit_tasks(self):
         """
         Submit tasks using the :attr:`graph` generated by :meth:`create_graph`.
@@ -45,16 +156,5 @@ class BaseParallelRunner(BaseRunner):
         return run_task_load_parents
 
 
-def run_task_load_parents(task):
-    task.pre_run()
-    try:
-        if task.is_finished():
-            task.load()
-        else:
-            for parent in task.get_parents():
-                parent.load()
-            task.run()
-        task.post_success_run()
-    except Exception as e:
-        task.post_error_run(e)
-        raise
+def run_task_load_parents(task, load=True):
+    run_task(task, task.get_parents(), load)
@@ -30,7 +30,7 @@ class IPythonParallelRunner(BaseParallelRunner):
             deps = [results[n] for n in self.graph.predecessors(node)]
             with view.temp_flags(after=deps):
                 results[node] = view.apply_async(self.run_func,
-                                                 self.nodetaskmap[node])
+                                                 *self.get_run_args(node))
 
     def wait_tasks(self):
         for r in self.results.values():
@@ -1,4 +1,6 @@
+import sys
 import multiprocessing
+import Queue
 
 from .baseparallel import BaseParallelRunner
 
@@ -7,6 +9,21 @@ class MultiprocessingRunner(BaseParallelRunner):
 
     """
     Task runner class based on :class:`multiprocessing.Pool`.
+
+    Tasks are submitted as soon as all of their parents are finished.
+    Completion of each task is notified through the callback of
+    :meth:`multiprocessing.Pool.apply_async`, so that the scheduler
+    does not need to poll the results.
+
+    In Python 2, failures outside of the task (e.g., a task which
+    can't be pickled) are not notified.  Such failures are checked
+    every :attr:`poll_interval` seconds while waiting.
+
+    """
+
+    poll_interval = 1.0
+    """
+    Seconds to wait for a notification before checking failed results.
     """
 
     def __init__(self, num_proc=2):
@@ -14,26 +31,61 @@ class MultiprocessingRunner(BaseParallelRunner):
         self.pool = multiprocessing.Pool(num_proc)
 
     def submit_tasks(self):
-        self.cached_sorted_nodes = self.sorted_nodes()
-        self.cached_predecessors = dict((n, self.graph.predecessors(n))
-                                        for n in self.cached_sorted_nodes)
+        self.finished = Queue.Queue()
         self.results = {}
-        self.submit_ready_tasks()
+        for node in self.init_pending_parents():
+            self.submit_node(node)
+
+    def submit_node(self, node):
+        def callback(error):
+            self.finished.put((node, error))
 
-    def submit_ready_tasks(self):
-        results = self.results
-        for node in self.cached_sorted_nodes:
-            predecessors = self.cached_predecessors[node]
-            if node not in results and \
-               all(p in results and results[p].ready() for p in predecessors):
-                results[node] = self.pool.apply_async(
-                    self.run_func, [self.nodetaskmap[node]])
+        kwds = dict(callback=callback)
+        if sys.version_info >= (3, 2):
+            # Get notified of errors outside of `call_and_return_error`
+            # (e.g., when the task can't be pickled).
+            kwds.update(error_callback=callback)
+        self.results[node] = self.pool.apply_async(
+            call_and_return_error, [self.run_func] + self.get_run_args(node),
+            **kwds)
 
     def wait_tasks(self):
+        for _ in range(len(self.graph)):
+            (node, error) = self.get_finished()
+            if error is not None:
+                # Re-raise the error in the subprocess
+                raise error
+            del self.results[node]
+            for child in self.mark_done(node):
+                self.submit_node(child)
+
+
+    def get_finished(self):
+        """
+        Wait for a finished task and return ``(node, error)``.
+
+        If a task failed without notification, its error is raised.
+
+        """
         while True:
-            for r in self.results.values():
-                # This would raise an error if there is one in subprocesses
-                r.get()
-            if set(self.nodetaskmap) == set(self.results):
-                break
-            self.submit_ready_tasks()
+            try:
+                return self.finished.get(timeout=self.poll_interval)
+            except Queue.Empty:
+                for result in self.results.values():
+                    if result.ready() and not result.successful():
+                        result.get()
+
+
+def call_and_return_error(func, *args):
+    """
+    Call ``func(*args)`` and return an exception if raised.
+
+    :meth:`multiprocessing.Pool.apply_async` calls its callback only on
+    success (`error_callback` is not available in Python 2).  Use this
+    function to get notified on both success and failure.
+
+    """
+    try:
+        func(*args)
+    except Exception as e:
+        return e
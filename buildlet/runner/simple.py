@@ -14,21 +14,68 @@ class SimpleRunner(BaseRunner):
 
         Run `task` and its unfinished ancestors.
 
+        Tasks are run one by one in a topological order and each task
+        is visited only once, even if it is shared by several child
+        tasks (see :meth:`get_task_key <.base.BaseRunner.get_task_key>`).
+        Finished tasks are loaded only when their results are needed,
+        i.e., when it is `task` itself or one of its child tasks is run.
+
+        """
+        sorted_tasks = cls.sorted_tasks(task)
+        for (t, parents) in sorted_tasks:
+            t.refresh()
+            for parent in parents:
+                parent.refresh()
+        # IDs of the task instances run or loaded:
+        done = set()
+        for (t, parents) in sorted_tasks:
+            # .. note:: Parent tasks are processed before `t` and
+            #    outside of the next try block, because the error in
+            #    parent task is treated by its `post_error_run` hook.
+            load = t is task
+            finished = t.is_finished()
+            if finished and not load:
+                continue
+            t.pre_run()
+            try:
+                if finished:
+                    t.load()
+                else:
+                    for parent in parents:
+                        if id(parent) not in done:
+                            parent.load()
+                            done.add(id(parent))
+                    t.run()
+                t.post_success_run()
+            except Exception as e:
+                t.post_error_run(e)
+                raise
+            done.add(id(t))
+
+    @classmethod
+    def sorted_tasks(cls, task):
+        """
+        Return a list of ``(task, parents)`` in a topological order.
+
+        The last element is for `task`.  Each task appears only once.
+        This function does not use recursion, so that it works with
+        deep task graphs.
+
         """
-        for parent in task.get_parents():
-            # This is redundant because `.load` or `.run` is called
-            # for *all* tasks regardless the state (need rerun or not).
-            cls.run(parent)
-        # .. note:: Do *not* put ``cls.run(parent)`` in the next try
-        #    block because the error in parent task is treated by its
-        #    `post_error_run` hook.
-        task.pre_run()
-        try:
-            if task.is_finished():
-                task.load()
-            else:
-                task.run()
-            task.post_success_run()
-        except Exception as e:
-            task.post_error_run(e)
-            raise
+        ordered = []
+        visited = set()
+        stack = [(task, None)]
+        while stack:
+            (t, parents) = stack.pop()
+            if parents is not None:
+                # All parents are processed
+                ordered.append((t, parents))
+                continue
+            key = cls.get_task_key(t)
+            if key in visited:
+                continue
+            visited.add(key)
+            parents = list(t.get_parents())
+            stack.append((t, parents))
+            stack.extend((p, None) for p in reversed(parents))
+        return ordered
@@ -0,0 +1,58 @@
+import Queue
+
+import concurrent.futures
+
+from .base import run_task
+from .baseparallel import BaseParallelRunner
+
+
+class ThreadPoolRunner(BaseParallelRunner):
+
+    """
+    Task runner class based on
+    :class:`concurrent.futures.ThreadPoolExecutor`.
+
+    This runner is suitable for I/O-bound tasks.  As tasks are run in
+    the same process, there is no pickling of tasks and parent tasks
+    are not reloaded from data store before running its child.
+
+    In Python 2, the `futures`_ package is required.
+
+    .. _futures: https://pypi.python.org/pypi/futures
+
+    """
+
+    def __init__(self, num_threads=2):
+        self.num_threads = num_threads
+        self.executor = concurrent.futures.ThreadPoolExecutor(num_threads)
+
+    def submit_tasks(self):
+        self.finished = Queue.Queue()
+        self.futures = {}
+        self.done_task_ids = set()
+        for node in self.init_pending_parents():
+            self.submit_node(node)
+
+    def submit_node(self, node):
+        future = self.futures[node] = self.executor.submit(
+            self.run_node, node)
+        future.add_done_callback(lambda f: self.finished.put((node, f)))
+
+    def run_node(self, node):
+        task = self.nodetaskmap[node]
+        # Parent task instance is not run nor loaded in this process
+        # when it is finished (and not needed until now) or collapsed
+        # into another instance by `get_task_key`.  Such task must be
+        # loaded.
+        parents_to_load = [p for p in task.get_parents()
+                           if id(p) not in self.done_task_ids]
+        if run_task(task, parents_to_load, load=(node == self.root)):
+            self.done_task_ids.add(id(task))
+
+    def wait_tasks(self):
+        for _ in range(len(self.graph)):
+            (node, future) = self.finished.get()
+            # This would raise an error if there is one in the thread
+            future.result()
+            for child in self.mark_done(node):
+                self.submit_node(child)
@@ -0,0 +1,160 @@
+"""
+Micro-benchmark of the value stores (serializers).
+
+Run::
+
+    python -m buildlet.samples.benchmark_serializers
+
+It prints the throughput of saving (``set``) and loading (``get``)
+representative payloads for each value store.  Throughput is
+computed from the size of the payload, measured as the length of
+its pickle, so that compressed stores are compared fairly.  Value
+stores which can't round-trip the type of a payload (e.g., an array
+to JSON) are skipped.
+
+"""
+
+from __future__ import print_function
+
+import os
+import timeit
+
+from buildlet.utils import _pickle
+from buildlet.utils.tempdir import TemporaryDirectory
+from buildlet.datastore.autoserialize import (
+    DataValuePickle, DataValueJSON, DataValueYAML, DataValueNumpy,
+    DataValueBytes)
+from buildlet.datastore.compressed import (
+    DataValuePickleCompressed, DataValueJSONCompressed)
+
+
+UNSUPPORTED = (TypeError, UnicodeError)
+"""
+Errors meaning that a value store does not support the payload.
+
+:func:`bench` raises TypeError for a payload loaded as another type.
+Serializers raise TypeError (JSON), UnicodeError (JSON in Python 2
+for non-text bytes) or :class:`yaml.YAMLError`.
+"""
+try:
+    import yaml
+except ImportError:
+    pass
+else:
+    UNSUPPORTED += (yaml.YAMLError,)
+
+
+def make_payloads(size):
+    """
+    Return a list of ``(name, payload)`` with payloads of about
+    `size` bytes.
+    """
+    n = max(size // 8, 1)
+    payloads = [
+        ('small-dict', {'key': 1, 'name': 'value', 'list': [1.0, 2.0]}),
+        ('records', [{'id': i, 'name': 'name-{0}'.format(i), 'score': i * 0.5}
+                     for i in range(max(n // 8, 1))]),
+        ('text', 'some words to repeat ' * max(size // 21, 1)),
+        ('bytes', os.urandom(size)),
+    ]
+    try:
+        import numpy
+    except ImportError:
+        pass
+    else:
+        payloads.append(('array', numpy.random.random(n)))
+    return payloads
+
+
+def make_stores():
+    """
+    Return a list of ``(name, dstype, kwds)`` of value stores.
+    """
+    stores = [
+        ('pickle', DataValuePickle, {}),
+        ('json', DataValueJSON, {}),
+        ('yaml', DataValueYAML, {}),
+        ('numpy', DataValueNumpy, {}),
+        ('bytes', DataValueBytes, {}),
+        ('pickle+gzip', DataValuePickleCompressed, {}),
+        ('pickle+gzip1', DataValuePickleCompressed, {'compresslevel': 1}),
+        ('pickle+bz2', DataValuePickleCompressed, {'compression': 'bz2'}),
+        ('json+gzip', DataValueJSONCompressed, {}),
+    ]
+    try:
+        import lzma
+    except ImportError:
+        pass
+    else:
+        stores.append(('pickle+lzma', DataValuePickleCompressed,
+                       {'compression': 'lzma'}))
+    return stores
+
+
+def bench(store, payload, repeat):
+    """
+    Return ``(filesize, set_seconds, get_seconds)`` (best of `repeat`).
+
+    :raises TypeError: if `store` can't round-trip the type of `payload`
+
+    """
+    store.set(payload)
+    if not isinstance(store.get(), type(payload)):
+        raise TypeError('{0} changes type of payload'.format(store))
+    filesize = os.path.getsize(store.path)
+    settime = min(timeit.repeat(lambda: store.set(payload),
+                                number=1, repeat=repeat))
+    # Access the loaded value, so that lazily loaded ones are read.
+    gettime = min(timeit.repeat(lambda: touch(store.get()),
+                                number=1, repeat=repeat))
+    return (filesize, settime, gettime)
+
+
+def touch(value):
+    if hasattr(value, 'sum') and hasattr(value, 'dtype'):
+        value.sum()
+    elif isinstance(value, dict):
+        for v in value.values():
+            touch(v)
+
+
+def run(size=1 << 22, repeat=3, stores=None, payloads=None, out=print):
+    """
+    Run the benchmark and print results using `out`.
+    """
+    stores = make_stores() if stores is None else stores
+    payloads = make_payloads(size) if payloads is None else payloads
+    out('{0:12} {1:14} {2:>12} {3:>12} {4:>12}'.format(
+        'payload', 'store', 'file [KiB]', 'set [MB/s]', 'get [MB/s]'))
+    with TemporaryDirectory() as tempdir:
+        for (pname, payload) in payloads:
+            megabytes = len(_pickle.dumps(payload, _pickle.HIGHEST_PROTOCOL))
+            megabytes /= 1e6
+            for (sname, dstype, kwds) in stores:
+                store = dstype(os.path.join(tempdir, sname), **kwds)
+                try:
+                    (filesize, settime, gettime) = bench(
+                        store, payload, repeat)
+                except UNSUPPORTED:
+                    continue
+                finally:
+                    store.clear()
+                out('{0:12} {1:14} {2:12.1f} {3:12.1f} {4:12.1f}'.format(
+                    pname, sname, filesize / 1024.0,
+                    megabytes / max(settime, 1e-9),
+                    megabytes / max(gettime, 1e-9)))
+
+
+def main(args=None):
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--size', type=int, default=1 << 22,
+                        help='approximate size of payloads in bytes')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='report the best of this number of runs')
+    ns = parser.parse_args(args)
+    run(size=ns.size, repeat=ns.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,3 +3,4 @@ Base classes to describe task and its dependencies.
 """
 from .base import *
 from .cacheabletask import *
+from .hashstore import *
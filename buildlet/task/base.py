@@ -19,7 +19,10 @@ class BaseTask(object):
         Load computed result from data store.
 
         This function is called instead of :meth:`run` when
-        :meth:`is_finished` returns True.
+        :meth:`is_finished` returns True.  Task runners call this
+        function only when the result is needed, i.e., for the root
+        task and for the parents of a task to be run.  Note that the
+        parents may be loaded after their :meth:`post_success_run`.
 
         """
 
@@ -46,9 +49,22 @@ class BaseTask(object):
 
         """
 
+    def refresh(self):
+        """
+        Forget any state memoized from data store.
+
+        Task runners call this method on every task before finding out
+        which tasks need to be run and again before running them.
+
+        """
+
     def is_finished(self):
         """
         Return True when the task is finished and loadable by :meth:`load`.
+
+        Note that task runner may call this method before
+        :meth:`pre_run` to find out tasks which do not need to be run.
+
         """
         return False
 
@@ -7,6 +7,7 @@ import operator
 
 from .base import BaseTask, BaseSimpleTask
 from ..datastore import DataDirectoryWithMagic
+from ..utils.hashutils import stablehash
 
 
 class BaseCacheableTask(BaseTask):
@@ -39,14 +40,24 @@ class BaseCacheableTask(BaseTask):
     Based on these values, `paramhash` and `resulthash` are
     calculated as follows.::
 
-        paramhash  = hash((paramvalue, parent_hashes))
-        resulthash = hash((paramvalue, parent_hashes, resultvalue))
+        paramhash  = stablehash((paramvalue, parent_hashes))
+        resulthash = stablehash((paramvalue, parent_hashes, resultvalue))
+
+    where :func:`stablehash <buildlet.utils.hashutils.stablehash>`
+    is a cryptographic digest of canonically encoded value.  Unlike
+    the builtin :func:`hash`, it gives the same value in every process
+    and every run.
 
     When the cache on :attr:`datastore` is found, cached `paramhash`
     is compared with calculated one (by :meth:`is_finished`).  If
     they differ, this task will be run again.  Otherwise, data will be
     loaded from :attr:`datastore`.
 
+    Cached hashes and `paramhash` are memoized in the task instance
+    until :meth:`refresh` or :meth:`invalidate_cache` is called.  Task
+    runners call :meth:`refresh` at the beginning of each run, so
+    `paramvalue` can be changed between runs.
+
     """
 
     datastore = None
@@ -62,6 +73,40 @@ class BaseCacheableTask(BaseTask):
 
     """
 
+    hashstore = None
+    """
+    Hash store instance (optional).
+
+    By default, hashes are stored as files in the metastore of
+    :attr:`datastore`.  When an instance of
+    :class:`buildlet.task.hashstore.BaseHashStore` is set, hashes are
+    stored in it instead.  The same instance can be shared by all
+    tasks.  See also :meth:`get_hashstore_key`.
+
+    """
+
+    _hashcache = None
+
+    def refresh(self):
+        self._hashcache = {}
+        if self.hashstore is not None:
+            self.hashstore.refresh()
+        super(BaseCacheableTask, self).refresh()
+
+    def get_hashcache(self):
+        """
+        Return a dict to memoize hashes during a run.
+        """
+        if self._hashcache is None:
+            self._hashcache = {}
+        return self._hashcache
+
+    def __getstate__(self):
+        # Memoized hashes may be outdated in other processes.
+        state = self.__dict__.copy()
+        state.pop('_hashcache', None)
+        return state
+
     def is_finished(self):
         current = self.get_hash('param')
         cached = self.get_cached_hash('param')
@@ -75,7 +120,12 @@ class BaseCacheableTask(BaseTask):
 
     def get_paramvalue(self):
         """
-        Return a hash-able object which represents parameter for this task.
+        Return an object which represents parameter for this task.
+
+        The object must be encodable by
+        :func:`buildlet.utils.hashutils.stablehash`, i.e., it must
+        consist of None, bool, numbers, strings, tuples, lists, dicts
+        and sets.
 
         Note that this value should not depend on the result
         of the :meth:`run` function.  Use :meth:`get_resultvalue`
@@ -91,7 +141,9 @@ class BaseCacheableTask(BaseTask):
 
     def get_resultvalue(self):
         """
-        Return a hash-able object which represents result of this task.
+        Return an object which represents result of this task.
+
+        The same restriction as :meth:`get_paramvalue` applies.
 
         Define this method to return an object which can identify the
         result of this task.  For example, if the result differs for
@@ -123,13 +175,17 @@ class BaseCacheableTask(BaseTask):
         parent_hashes = self.get_parent_hashes()
         if any(h is None for h in parent_hashes):
             return None
-        paramvalue = self.get_paramvalue()
-        value = (paramvalue, parent_hashes)
-        if hashname == 'result':
-            value += (self.get_resultvalue(),)
-        # TODO: This relies on that `hash` returns the same value for every
-        #       run.  Does it hold always?  Find out!
-        return hash(value)
+        if hashname == 'param':
+            # `paramvalue` does not change during a run, but parents
+            # may be run and change their hashes.
+            hashcache = self.get_hashcache()
+            key = ('param', parent_hashes)
+            if key not in hashcache:
+                hashcache[key] = stablehash(
+                    (self.get_paramvalue(), parent_hashes))
+            return hashcache[key]
+        return stablehash(
+            (self.get_paramvalue(), parent_hashes, self.get_resultvalue()))
 
     def get_parent_hashes(self, hashname='result'):
         """
@@ -153,22 +209,53 @@ class BaseCacheableTask(BaseTask):
         self._check_hashname(hashname)
         return self.get_metafilestore(hashname + 'hash')
 
+    def get_hashstore_key(self):
+        """
+        Return a key to identify this task in :attr:`hashstore`.
+
+        Default is the absolute path of :attr:`datastore`.
+
+        """
+        path = getattr(self.datastore, 'path', None)
+        if path is None:
+            raise ValueError(
+                "{0!r} can't be used as a key of hash store, as it has no "
+                "path.  Override `get_hashstore_key`.".format(self.datastore))
+        return os.path.abspath(path)
+
     def get_cached_hash(self, hashname):
+        hashcache = self.get_hashcache()
+        key = ('cached', hashname)
+        if key not in hashcache:
+            hashcache[key] = self.read_cached_hash(hashname)
+        return hashcache[key]
+
+    def read_cached_hash(self, hashname):
+        if self.hashstore is not None:
+            self._check_hashname(hashname)
+            return self.hashstore.get(self.get_hashstore_key(), hashname)
         store = self.get_hashfilestore(hashname)
         if not store.exists():
             return None
-        with store.open() as f:
+        with store.open('rb') as f:
             cache = f.read()
         # I need this check, as DataDirectory creates empty file to
         # represent the existence of key.
         if cache:
-            return int(cache)
+            # Use native string, as returned by `get_hash`.
+            return str(cache.decode('ascii'))
 
     def set_cached_hash(self, hashname):
-        store = self.get_hashfilestore(hashname)
         taskhash = self.get_hash(hashname)
-        with store.open('wb') as f:
-            f.write(str(taskhash).encode())
+        if self.hashstore is not None:
+            self.hashstore.set(self.get_hashstore_key(), hashname, taskhash)
+        else:
+            store = self.get_hashfilestore(hashname)
+            with store.open('wb') as f:
+                # Empty file means "no hash" (see `get_cached_hash`).
+                if taskhash is not None:
+                    f.write(taskhash.encode())
+        self.get_hashcache()[('cached', hashname)] = taskhash
 
     def post_success_run(self):
         self.set_cached_hash('result')
@@ -179,8 +266,12 @@ class BaseCacheableTask(BaseTask):
         """
         Invalidate cache of this task.
         """
-        self.get_hashfilestore('result').clear()
-        self.get_hashfilestore('param').clear()
+        if self.hashstore is not None:
+            self.hashstore.delete(self.get_hashstore_key())
+        else:
+            self.get_hashfilestore('result').clear()
+            self.get_hashfilestore('param').clear()
+        self._hashcache = {}
 
 
 class BaseSimpleCacheableTask(BaseCacheableTask, BaseSimpleTask):
@@ -0,0 +1,198 @@
+"""
+Stores to keep hashes of many cacheable tasks in one place.
+
+By default, :class:`buildlet.task.cacheabletask.BaseCacheableTask`
+stores its hashes as small files in the metastore of its data store.
+Set its :attr:`hashstore <.cacheabletask.BaseCacheableTask.hashstore>`
+attribute to one of the classes defined here to keep hashes of all
+tasks in a single indexed store instead.
+
+"""
+
+import os
+import sqlite3
+import threading
+
+from ..utils import mkdirp
+
+
+class BaseHashStore(object):
+
+    """
+    Base class for hash stores.
+
+    Hashes are stored for each pair of `key` and `hashname`.
+    `key` is a string identifying a task (see
+    :meth:`.cacheabletask.BaseCacheableTask.get_hashstore_key`) and
+    `hashname` is ``'param'`` or ``'result'``.
+
+    """
+
+    def get(self, key, hashname):
+        """Return stored hash or None if there is no hash."""
+        raise NotImplementedError
+
+    def set(self, key, hashname, value):
+        """Store hash `value`.  None means to remove the hash."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Remove all hashes of `key`."""
+        raise NotImplementedError
+
+    def get_all(self, hashname):
+        """Return a dict from key to hash stored under `hashname`."""
+        raise NotImplementedError
+
+    def refresh(self):
+        """
+        Forget hashes read so far.
+
+        This is called via :meth:`.base.BaseTask.refresh` by task
+        runners at the beginning of each run.
+
+        """
+
+    def stale_keys(self, paramhashes):
+        """
+        Return a list of stale keys.
+
+        `paramhashes` is a dict from key to the current `paramhash`
+        of the task.  A key is stale when its stored `paramhash` is
+        missing or differs from the given one.  This is done by
+        a single call of :meth:`get_all`.
+
+        """
+        stored = self.get_all('param')
+        return [k for (k, v) in paramhashes.items()
+                if v is None or stored.get(k) != v]
+
+
+class HashStoreSQLite(BaseHashStore):
+
+    """
+    Hash store backed by an SQLite database file at `path`.
+
+    >>> from buildlet.utils.tempdir import TemporaryDirectory
+    >>> with TemporaryDirectory() as tempdir:
+    ...     hs = HashStoreSQLite(os.path.join(tempdir, 'hashes.sqlite'))
+    ...     hs.set('/some/task', 'param', 'abc')
+    ...     print(hs.get('/some/task', 'param'))
+    ...     print(hs.get('/some/task', 'result'))
+    abc
+    None
+
+    After :meth:`refresh` is called, all hashes are read by one
+    query when a hash is requested and they are used until the next
+    :meth:`refresh`.  Instances unpickled in worker processes query
+    hashes one by one instead, as they typically need only a few of
+    them.
+
+    The database is opened in `journal_mode` (see the SQLite
+    documentation of ``PRAGMA journal_mode``).  The default ``'WAL'``
+    lets readers work while a writer is updating the database.  Note
+    that WAL mode does not work over network file systems; use
+    ``'DELETE'`` for a database on NFS.
+
+    """
+
+    def __init__(self, path, journal_mode='WAL', timeout=60):
+        self.path = path
+        self.journal_mode = journal_mode
+        self.timeout = timeout
+        self._setup()
+
+    def _setup(self):
+        self._connection = None
+        self._snapshot = None
+        self._use_snapshot = False
+        self._lock = threading.RLock()
+
+    def __getstate__(self):
+        # Connection and lock can't be pickled.
+        return dict(path=self.path, journal_mode=self.journal_mode,
+                    timeout=self.timeout)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._setup()
+
+    def connect(self):
+        """Return a (cached) connection to the database."""
+        if self._connection is None:
+            mkdirp(os.path.dirname(os.path.abspath(self.path)))
+            conn = sqlite3.connect(self.path, timeout=self.timeout,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode={0}'.format(self.journal_mode))
+            with conn:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS hashes ('
+                    'key TEXT NOT NULL, hashname TEXT NOT NULL, '
+                    'value TEXT NOT NULL, PRIMARY KEY (key, hashname))')
+            self._connection = conn
+        return self._connection
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def refresh(self):
+        with self._lock:
+            self._snapshot = None
+            self._use_snapshot = True
+
+    def _load_snapshot(self):
+        snapshot = {}
+        rows = self.connect().execute(
+            'SELECT key, hashname, value FROM hashes')
+        for (key, hashname, value) in rows:
+            snapshot[(key, hashname)] = str(value)
+        self._snapshot = snapshot
+
+    def get(self, key, hashname):
+        with self._lock:
+            if self._use_snapshot:
+                if self._snapshot is None:
+                    self._load_snapshot()
+                return self._snapshot.get((key, hashname))
+            row = self.connect().execute(
+                'SELECT value FROM hashes WHERE key = ? AND hashname = ?',
+                (key, hashname)).fetchone()
+            if row is not None:
+                return str(row[0])
+
+    def set(self, key, hashname, value):
+        if value is None:
+            sql = 'DELETE FROM hashes WHERE key = ? AND hashname = ?'
+            args = (key, hashname)
+        else:
+            sql = ('INSERT OR REPLACE INTO hashes (key, hashname, value) '
+                   'VALUES (?, ?, ?)')
+            args = (key, hashname, value)
+        with self._lock:
+            conn = self.connect()
+            with conn:
+                conn.execute(sql, args)
+            if self._snapshot is not None:
+                if value is None:
+                    self._snapshot.pop((key, hashname), None)
+                else:
+                    self._snapshot[(key, hashname)] = value
+
+    def delete(self, key):
+        with self._lock:
+            conn = self.connect()
+            with conn:
+                conn.execute('DELETE FROM hashes WHERE key = ?', (key,))
+            if self._snapshot is not None:
+                for k in [k for k in self._snapshot if k[0] == key]:
+                    del self._snapshot[k]
+
+    def get_all(self, hashname):
+        with self._lock:
+            rows = self.connect().execute(
+                'SELECT key, value FROM hashes WHERE hashname = ?',
+                (hashname,))
+            return dict((k, str(v)) for (k, v) in rows)
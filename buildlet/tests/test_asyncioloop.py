@@ -0,0 +1,65 @@
+import sys
+import unittest
+
+from ..runner.asyncioloop import AsyncioRunner, asyncio
+from ..task import BaseSimpleTask
+
+# Avoid importing test case at top-level to duplicated test
+from . import test_cacheabletask
+from . import test_cacheabletask_directory
+from . import test_three
+
+if asyncio is None:
+    # Python < 3.4.  `unittest.SkipTest` is not available in 2.6.
+    from nose import SkipTest
+    raise SkipTest('asyncio is not available')
+
+
+class TestCacheableTaskAsyncio(test_cacheabletask.TestCacheableTask):
+    RunnerClass = AsyncioRunner
+
+
+class TestCacheableTaskDirectoryAsyncio(
+        test_cacheabletask_directory.TestCacheableTaskDirectory):
+    RunnerClass = AsyncioRunner
+
+
+class TestThreeLayerCacheableTaskAsyncio(
+        test_three.TestThreeLayerCacheableTask):
+    RunnerClass = AsyncioRunner
+
+
+class TestThreeLayerCacheableTaskAsyncioSerial(
+        test_three.TestThreeLayerCacheableTask):
+
+    def setup_runner(self):
+        self.runner = AsyncioRunner(max_concurrency=1)
+
+
+# `async def` is a syntax error in Python 2, so define the task in a
+# string.
+NATIVE_COROUTINE_TASK = """
+class NativeCoroutineTask(BaseSimpleTask):
+
+    async def run(self):
+        for parent in self.get_parents():
+            assert parent in self.log
+        await asyncio.sleep(0)
+        self.log.append(self)
+"""
+
+
+@unittest.skipIf(sys.version_info < (3, 5), 'async def is not supported')
+class TestNativeCoroutineTask(unittest.TestCase):
+
+    def test_async_run(self):
+        namespace = dict(BaseSimpleTask=BaseSimpleTask, asyncio=asyncio)
+        exec(NATIVE_COROUTINE_TASK, namespace)
+        task_class = namespace['NativeCoroutineTask']
+        log = []
+        leaves = [task_class(log=log) for _ in range(3)]
+        branches = [task_class(log=log, _parents=leaves) for _ in range(2)]
+        root = task_class(log=log, _parents=branches)
+        AsyncioRunner().run(root)
+        self.assertEqual(len(log), 6)
+        self.assertTrue(log[-1] is root)
@@ -0,0 +1,81 @@
+import unittest
+
+from ..utils.tempdir import TemporaryDirectory
+from ..datastore.directory import DataDirectory
+from ..datastore.inmemory import DataStoreNestableInMemory
+from ..task import BaseSimpleTask
+from ..runner.simple import SimpleRunner
+from ..runner.baseparallel import BaseParallelRunner
+from ..utils.mocklet import Mock
+from .test_cacheabletask import CacheableRootTask, TestingCacheableTask
+
+
+class DiamondTask(BaseSimpleTask):
+
+    """
+    Task whose parents share the same grand parent.
+    """
+
+    def generate_parents(self):
+        shared = BaseSimpleTask()
+        return [BaseSimpleTask(_parents=[shared]),
+                BaseSimpleTask(_parents=[shared])]
+
+
+class TestCreateGraph(unittest.TestCase):
+
+    def test_shared_parent_is_one_node(self):
+        runner = BaseParallelRunner()
+        task = DiamondTask()
+        runner.create_graph(task)
+        self.assertEqual(len(runner.graph), 4)
+        self.assertEqual(len(runner.nodetaskmap), 4)
+        self.assertTrue(runner.nodetaskmap[runner.root] is task)
+
+    def test_deep_diamonds_do_not_explode(self):
+        task = BaseSimpleTask()
+        for _ in range(30):
+            task = BaseSimpleTask(_parents=[task, BaseSimpleTask(
+                _parents=[task])])
+        runner = BaseParallelRunner()
+        runner.create_graph(task)
+        self.assertEqual(len(runner.graph), 61)
+
+    def test_same_datastore_path_is_one_node(self):
+        with TemporaryDirectory() as tempdir:
+            ds = DataDirectory(tempdir)
+            parents = [BaseSimpleTask(datastore=ds.get_substore('shared'))
+                       for _ in range(3)]
+            runner = BaseParallelRunner()
+            runner.create_graph(BaseSimpleTask(_parents=parents))
+            self.assertEqual(len(runner.graph), 2)
+
+
+class TestPruneGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.task = CacheableRootTask(
+            MockClass=Mock,
+            ParentTaskClass=TestingCacheableTask,
+            datastore=DataStoreNestableInMemory())
+        self.runner = BaseParallelRunner()
+
+    def plan(self):
+        self.runner.create_graph(self.task)
+        self.runner.prune_graph()
+        return self.runner.graph
+
+    def test_nothing_is_pruned_before_first_run(self):
+        self.assertEqual(len(self.plan()), 4)
+        self.assertEqual(self.runner.pruned_nodes, [])
+
+    def test_only_root_remains_for_noop_rebuild(self):
+        SimpleRunner.run(self.task)
+        self.assertEqual(self.plan().nodes(), [self.runner.root])
+
+    def test_invalidated_parent_remains(self):
+        SimpleRunner.run(self.task)
+        self.task.get_parents()[0].invalidate_cache()
+        graph = self.plan()
+        self.assertEqual(len(graph), 2)
+        self.assertEqual(len(self.runner.pruned_nodes), 2)
@@ -39,6 +39,9 @@ class TestCacheableTask(test_simple.TestSimpleTask):
     ParentTaskClass = TestingCacheableTask
     DataStoreClass = DataStoreNestableInMemory
 
+    # Number of `load` calls of a finished parent task when its child runs
+    finished_parent_load_num = 1
+
     def setup_task(self):
         self.setup_datastore()
         super(TestCacheableTask, self).setup_task()
@@ -76,6 +79,12 @@ class TestCacheableTask(test_simple.TestSimpleTask):
             assert_run_num_p_in_range(i, 2, 'post_success_run')
             self.assert_run_num(0, func='post_error_run')
 
+    def test_finished_parents_are_not_loaded(self):
+        self.test_simple_run()
+        self.runner.run(self.task)
+        # Only the root task is loaded, as nothing is run.
+        self.assert_run_num(1, 0, func='load')
+
     def test_invalidate_root(self):
         self.test_simple_run()
         self.task.invalidate_cache()
@@ -85,11 +94,16 @@ class TestCacheableTask(test_simple.TestSimpleTask):
     def check_invalidate_root(self):
         self.assertRaises(AssertionError, self.assert_run_num, 1)
         self.assert_run_num(2, 1)
-        self.assert_run_num(0, 1, func='load')
-        self.assert_run_num(2, 2, func='pre_run')
-        self.assert_run_num(2, 2, func='post_success_run')
+        # Finished parent tasks are skipped by the runner and just
+        # loaded by the root task.
+        self.check_finished_parents_load()
+        self.assert_run_num(2, 1, func='pre_run')
+        self.assert_run_num(2, 1, func='post_success_run')
         self.assert_run_num(0, func='post_error_run')
 
+    def check_finished_parents_load(self):
+        self.assert_run_num(0, self.finished_parent_load_num, func='load')
+
     def test_invalidate_parent(self):
         self.test_simple_run()
         # Invalidate 0-th parent node cache
@@ -1,7 +1,12 @@
+import os
 import tempfile
 import shutil
+import unittest
 
 from ..datastore.directory import DataDirectory
+from ..task.cacheabletask import BaseSimpleCacheableTask
+from ..runner.simple import SimpleRunner
+from ..runner.threadpool import ThreadPoolRunner
 
 # Avoid importing test case at top-level to duplicated test
 from . import test_cacheabletask
@@ -22,3 +27,83 @@ class MixInTestDataDirectory(object):
 class TestCacheableTaskDirectory(MixInTestDataDirectory,
                                  test_cacheabletask.TestCacheableTask):
     pass
+
+
+class HashCountingTask(BaseSimpleCacheableTask):
+
+    """
+    Task recording runs and reads of cached hashes in shared lists.
+    """
+
+    def __init__(self, log, reads, parents=(), **kwds):
+        super(HashCountingTask, self).__init__(
+            log=log, reads=reads, _parents=list(parents), **kwds)
+
+    def run(self):
+        self.log.append(self.basepath)
+
+    def get_resultvalue(self):
+        # Result differs for every run
+        return len(self.log)
+
+    def read_cached_hash(self, hashname):
+        self.reads.append((id(self), hashname))
+        return super(HashCountingTask, self).read_cached_hash(hashname)
+
+
+class TestHashCache(unittest.TestCase):
+
+    RunnerClass = SimpleRunner
+    max_reads = 1
+    """Number of times cached hash can be read per task in one run."""
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.log = []
+        self.reads = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def make_task(self, name, parents=()):
+        return HashCountingTask(
+            self.log, self.reads, parents,
+            basepath=os.path.join(self.tempdir, name))
+
+    def make_diamond(self):
+        # "shared" task is represented by two instances
+        parents = [self.make_task(str(i), [self.make_task('shared')])
+                   for i in range(2)]
+        return self.make_task('root', parents)
+
+    def test_hash_read_once_per_run(self):
+        task = self.make_diamond()
+        self.RunnerClass().run(task)
+        del self.reads[:]
+        self.RunnerClass().run(self.make_diamond())
+        assert self.reads
+        for r in set(self.reads):
+            self.assertTrue(self.reads.count(r) <= self.max_reads)
+
+    def test_rerun_shared_parent(self):
+        task = self.make_diamond()
+        self.RunnerClass().run(task)
+        task.get_parents()[0].get_parents()[0].invalidate_cache()
+        start = len(self.log)
+        self.RunnerClass().run(task)
+        self.assertEqual(
+            sorted(os.path.basename(p) for p in self.log[start:]),
+            ['0', '1', 'root', 'shared'])
+
+    def test_refresh_before_run(self):
+        task = self.make_diamond()
+        self.RunnerClass().run(task)
+        # Modify cache behind the task instances
+        self.make_task('shared').invalidate_cache()
+        start = len(self.log)
+        self.RunnerClass().run(task)
+        self.assertEqual(len(self.log) - start, 4)
+
+
+class TestHashCacheThreadPool(TestHashCache):
+    RunnerClass = ThreadPoolRunner
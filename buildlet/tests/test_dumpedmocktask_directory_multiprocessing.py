@@ -1,4 +1,7 @@
+import unittest
+
 from ..runner.multiprocessingpool import MultiprocessingRunner
+from ..task import BaseSimpleTask
 
 from . import test_dumpedmocktask_directory
 
@@ -16,3 +19,44 @@ class TestingMultiprocessingRunner(MultiprocessingRunner):
 class TestDumpedMockTaskDirectoryMultiprocessing(
         test_dumpedmocktask_directory.TestDumpedMockTaskDirectory):
     RunnerClass = TestingMultiprocessingRunner
+    # Finished parents are loaded in the worker running the root task.
+    # They are not submitted, so their mocks are not reloaded here.
+    finished_parent_load_num = 0
+
+
+class UnpicklableTask(BaseSimpleTask):
+
+    def __init__(self):
+        self.func = lambda: None
+
+    def run(self):
+        pass
+
+
+class UnpicklableError(Exception):
+
+    def __init__(self):
+        super(UnpicklableError, self).__init__()
+        self.func = lambda: None
+
+
+class UnpicklableErrorTask(BaseSimpleTask):
+
+    def run(self):
+        raise UnpicklableError()
+
+
+class TestMultiprocessingRunnerError(unittest.TestCase):
+
+    def setUp(self):
+        self.runner = MultiprocessingRunner()
+        self.runner.poll_interval = 0.05
+
+    def tearDown(self):
+        self.runner.pool.terminate()
+
+    def test_unpicklable_task(self):
+        self.assertRaises(Exception, self.runner.run, UnpicklableTask())
+
+    def test_unpicklable_error(self):
+        self.assertRaises(Exception, self.runner.run, UnpicklableErrorTask())
@@ -0,0 +1,97 @@
+import os
+import tempfile
+import shutil
+import unittest
+
+from ..utils import _pickle as pickle
+from ..task.hashstore import HashStoreSQLite
+from ..runner.threadpool import ThreadPoolRunner
+
+# Avoid importing test case at top-level to duplicated test
+from . import test_cacheabletask
+from . import test_cacheabletask_directory
+
+
+class TestHashStoreSQLite(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.hs = self.make_hashstore()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def make_hashstore(self):
+        return HashStoreSQLite(os.path.join(self.tempdir, 'hashes.sqlite'))
+
+    def test_set_get_delete(self):
+        self.hs.set('a', 'param', 'p')
+        self.hs.set('a', 'result', 'r')
+        self.assertEqual(self.hs.get('a', 'param'), 'p')
+        self.assertEqual(self.hs.get('a', 'result'), 'r')
+        self.hs.set('a', 'result', None)
+        self.assertEqual(self.hs.get('a', 'result'), None)
+        self.hs.delete('a')
+        self.assertEqual(self.hs.get('a', 'param'), None)
+
+    def test_persistent(self):
+        self.hs.set('a', 'param', 'p')
+        self.hs.close()
+        self.assertEqual(self.make_hashstore().get('a', 'param'), 'p')
+
+    def test_snapshot(self):
+        self.hs.set('a', 'param', 'p')
+        self.hs.refresh()
+        self.assertEqual(self.hs.get('a', 'param'), 'p')
+        # Change by another instance is not visible until refresh
+        self.make_hashstore().set('a', 'param', 'q')
+        self.assertEqual(self.hs.get('a', 'param'), 'p')
+        # Change by this instance is visible
+        self.hs.set('b', 'param', 'p')
+        self.assertEqual(self.hs.get('b', 'param'), 'p')
+        self.hs.refresh()
+        self.assertEqual(self.hs.get('a', 'param'), 'q')
+
+    def test_pickle(self):
+        self.hs.set('a', 'param', 'p')
+        self.hs.refresh()
+        self.hs.get('a', 'param')
+        hs = pickle.loads(pickle.dumps(self.hs))
+        self.assertEqual(hs.get('a', 'param'), 'p')
+        self.hs.set('a', 'param', 'q')
+        self.assertEqual(hs.get('a', 'param'), 'q')
+
+    def test_stale_keys(self):
+        self.hs.set('a', 'param', 'p')
+        self.hs.set('b', 'param', 'p')
+        stale = self.hs.stale_keys(dict(a='p', b='q', c='p', d=None))
+        self.assertEqual(sorted(stale), ['b', 'c', 'd'])
+
+
+class HashStoreRootTask(test_cacheabletask.CacheableRootTask):
+
+    def generate_parents(self):
+        parents = super(HashStoreRootTask, self).generate_parents()
+        for p in parents:
+            p.hashstore = self.hashstore
+        return parents
+
+
+class TestCacheableTaskHashStore(
+        test_cacheabletask_directory.TestCacheableTaskDirectory):
+
+    TaskClass = HashStoreRootTask
+
+    def get_taskclass_kwds(self):
+        kwds = super(TestCacheableTaskHashStore, self).get_taskclass_kwds()
+        kwds.update(hashstore=HashStoreSQLite(
+            os.path.join(self.tempdir, 'hashes.sqlite')))
+        return kwds
+
+    def test_no_metastore(self):
+        self.test_simple_run()
+        self.assertFalse(os.path.exists(self.ds.get_metastorepath()))
+
+
+class TestCacheableTaskHashStoreThreadPool(TestCacheableTaskHashStore):
+    RunnerClass = ThreadPoolRunner
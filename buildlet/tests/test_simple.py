@@ -151,3 +151,35 @@ class TestSimpleTask(unittest.TestCase):
         should_be_exception = call_args_list[0][0][0]
         assert isinstance(should_be_exception, ValueError)
         self.assertEqual(should_be_exception.args, exception.args)
+
+
+class CountingTask(BaseSimpleTask):
+
+    def __init__(self, counter, parents=()):
+        super(CountingTask, self).__init__(counter=counter,
+                                           _parents=list(parents))
+
+    def run(self):
+        self.counter.append(self)
+
+
+class TestSimpleRunnerGraph(unittest.TestCase):
+
+    def test_shared_parent_is_run_once(self):
+        counter = []
+        shared = CountingTask(counter)
+        branches = [CountingTask(counter, [shared]) for _ in range(3)]
+        root = CountingTask(counter, branches)
+        SimpleRunner.run(root)
+        self.assertEqual(len(counter), 5)
+        self.assertTrue(counter[0] is shared)
+        self.assertTrue(counter[-1] is root)
+
+    def test_deep_chain(self):
+        counter = []
+        task = CountingTask(counter)
+        for _ in range(5000):
+            task = CountingTask(counter, [task])
+        SimpleRunner.run(task)
+        self.assertEqual(len(counter), 5001)
+        self.assertTrue(counter[-1] is task)
@@ -0,0 +1,20 @@
+from ..runner.threadpool import ThreadPoolRunner
+
+# Avoid importing test case at top-level to duplicated test
+from . import test_cacheabletask
+from . import test_cacheabletask_directory
+from . import test_three
+
+
+class TestCacheableTaskThreadPool(test_cacheabletask.TestCacheableTask):
+    RunnerClass = ThreadPoolRunner
+
+
+class TestCacheableTaskDirectoryThreadPool(
+        test_cacheabletask_directory.TestCacheableTaskDirectory):
+    RunnerClass = ThreadPoolRunner
+
+
+class TestThreeLayerCacheableTaskThreadPool(
+        test_three.TestThreeLayerCacheableTask):
+    RunnerClass = ThreadPoolRunner
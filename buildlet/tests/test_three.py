@@ -76,6 +76,10 @@ class TestThreeLayerCacheableTask(test_cacheabletask.TestCacheableTask):
         for (expr, task) in self.iter_task_expr_val_pairs((2,)):
             self.assert_task_counter(func, grand_parent_num, task, expr)
 
+    def check_finished_parents_load(self):
+        # Grand parents are not loaded as their children are finished.
+        self.assert_run_num(0, self.finished_parent_load_num, 0, func='load')
+
     def test_invalidate_grand_parent(self):
         self.test_simple_run()
         # Invalidate 0-th grand parent node cache
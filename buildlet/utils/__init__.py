@@ -1,5 +1,12 @@
 import os
 import collections
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows.  Files are not locked then.
+    fcntl = None
 
 
 def mkdirp(path):
@@ -8,6 +15,31 @@ def mkdirp(path):
         os.makedirs(path)
 
 
+@contextmanager
+def lockedfile(path):
+    """
+    Open `path` for reading and writing while holding an exclusive lock.
+
+    The file is created if it does not exist.  It is not truncated.
+
+    >>> from buildlet.utils.tempdir import TemporaryDirectory
+    >>> with TemporaryDirectory() as tempdir:
+    ...     path = os.path.join(tempdir, 'file')
+    ...     with lockedfile(path) as f:
+    ...         _ = f.write('data')
+    ...     with lockedfile(path) as f:
+    ...         print(f.read())
+    data
+
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+    with os.fdopen(fd, 'r+') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        # Lock is released when the file is closed.
+        yield f
+
+
 class memoizemethod(object):
 
     """
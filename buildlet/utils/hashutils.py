@@ -6,3 +6,114 @@ def hexdigest(strings):
     for s in strings:
         m.update(s.encode())
     return m.hexdigest()
+
+
+try:
+    hashlib.blake2b
+except AttributeError:
+    # Python < 3.6
+    new_digest = hashlib.sha256
+else:
+    def new_digest():
+        return hashlib.blake2b(digest_size=32)
+
+
+def filedigest(path, chunksize=1 << 20):
+    """
+    Return a hex digest of the content of the file at `path`.
+
+    The file is read in chunks of `chunksize` bytes, so that a large
+    file is hashed in constant memory.
+
+    """
+    m = new_digest()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunksize)
+            if not chunk:
+                break
+            m.update(chunk)
+    return m.hexdigest()
+
+
+def stablehash(obj):
+    """
+    Return a hex digest of `obj` which is stable across processes.
+
+    Unlike the builtin :func:`hash`, the returned value does not
+    depend on hash randomization (``PYTHONHASHSEED``), so it is the
+    same in every (worker) process and in every run.
+
+    >>> stablehash({'a': 1, 'b': 2}) == stablehash({'b': 2, 'a': 1})
+    True
+    >>> stablehash((1, 2)) == stablehash([1, 2])
+    False
+
+    Supported types are None, bool, int, float, (byte and unicode)
+    strings, and tuple, list, dict, set and frozenset of them.  See
+    :func:`canonical_encode`.
+
+    """
+    m = new_digest()
+    m.update(canonical_encode(obj))
+    return m.hexdigest()
+
+
+def canonical_encode(obj):
+    """
+    Encode `obj` into an unambiguous byte string.
+
+    Equal objects are encoded into the same string regardless of
+    the order of items in dict and set.
+
+    >>> print(canonical_encode(None).decode())
+    N
+    >>> print(canonical_encode((u'a', [1, 2.5])).decode())
+    t2:u1:al2:i1;f2.5;
+
+    :raises TypeError: if `obj` (or its element) is of unsupported type
+
+    """
+    out = []
+    _encode(obj, out)
+    return b''.join(out)
+
+
+def _encode_len(tag, length, out):
+    out.append(tag + str(length).encode('ascii') + b':')
+
+
+def _encode(obj, out):
+    if obj is None:
+        out.append(b'N')
+    elif obj is True:
+        out.append(b'T')
+    elif obj is False:
+        out.append(b'F')
+    elif isinstance(obj, (int, long)):
+        out.append(b'i' + str(obj).encode('ascii') + b';')
+    elif isinstance(obj, float):
+        out.append(b'f' + repr(obj).encode('ascii') + b';')
+    elif isinstance(obj, bytes):
+        _encode_len(b'b', len(obj), out)
+        out.append(obj)
+    elif isinstance(obj, unicode):
+        data = obj.encode('utf-8')
+        _encode_len(b'u', len(data), out)
+        out.append(data)
+    elif isinstance(obj, (tuple, list)):
+        _encode_len(b't' if isinstance(obj, tuple) else b'l', len(obj), out)
+        for item in obj:
+            _encode(item, out)
+    elif isinstance(obj, dict):
+        _encode_len(b'd', len(obj), out)
+        items = sorted(canonical_encode(k) + canonical_encode(v)
+                       for (k, v) in obj.items())
+        out.extend(items)
+    elif isinstance(obj, (set, frozenset)):
+        _encode_len(b's', len(obj), out)
+        out.extend(sorted(map(canonical_encode, obj)))
+    else:
+        raise TypeError(
+            "Object of type {0} can't be encoded canonically: {1!r}"
+            .format(type(obj).__name__, obj))
@@ -0,0 +1,54 @@
+import os
+import sys
+import subprocess
+
+from ..hashutils import stablehash, canonical_encode
+
+ROOTDIR = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__)))))
+
+
+def test_stablehash_order_independent():
+    keys = ['key{0}'.format(i) for i in range(100)]
+    d1 = dict((k, i) for (i, k) in enumerate(keys))
+    d2 = dict((k, i) for (i, k) in reversed(list(enumerate(keys))))
+    assert stablehash(d1) == stablehash(d2)
+    assert stablehash(set(keys)) == stablehash(set(reversed(keys)))
+
+
+def test_stablehash_distinguishes_types():
+    values = [None, True, False, 0, 1, 1.0, '1', (), [], {}, set(),
+              ('a', 'b'), ('ab',), ['a', 'b'], {'a': 'b'}, set(['a', 'b'])]
+    hashes = set(map(stablehash, values))
+    assert len(hashes) == len(values)
+
+
+def test_stablehash_unsupported_type():
+    for obj in [object(), {'a': [object()]}]:
+        try:
+            stablehash(obj)
+        except TypeError:
+            pass
+        else:
+            raise AssertionError('TypeError is not raised for {0!r}'
+                                 .format(obj))
+
+
+def test_canonical_encode_nested():
+    assert canonical_encode({'a': [1, {2: None}]}) == \
+        canonical_encode({'a': [1, {2: None}]})
+
+
+def stablehash_in_subprocess(obj, hashseed):
+    code = ('from buildlet.utils.hashutils import stablehash; '
+            'print(stablehash({0!r}))'.format(obj))
+    env = dict(os.environ, PYTHONHASHSEED=str(hashseed))
+    output = subprocess.check_output([sys.executable, '-c', code],
+                                     env=env, cwd=ROOTDIR)
+    return output.decode().strip()
+
+
+def test_stablehash_across_processes():
+    obj = {'a': set(['x', 'y', 'z']), 'b': ('p', 'q', 1.5), 'c': None}
+    hashes = set(stablehash_in_subprocess(obj, seed) for seed in [1, 2, 3])
+    assert hashes == set([stablehash(obj)])